@@ -15,6 +15,15 @@ class Config:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     search_strategy
+    *D. Rawlins    18-OCT-2026       1.2     fast_elbow, plot_elbow
+    *D. Rawlins    18-OCT-2026       1.3     imputer_strategy
+    *D. Rawlins    18-OCT-2026       1.4     batch_chunk_size
+    *D. Rawlins    18-OCT-2026       1.5     result_format
+    *D. Rawlins    18-OCT-2026       1.6     prediction micro-batching
+    *D. Rawlins    18-OCT-2026       1.7     server settings
+    *D. Rawlins    18-OCT-2026       1.8     background job limits
+    *D. Rawlins    18-OCT-2026       1.9     elbow_sample_size
     *
     *
     *description: Class for configuration instance attributes
@@ -27,6 +36,32 @@ class Config:
         self.training_database = 'training'
         self.prediction_data_path = 'data/prediction_data'
         self.prediction_database = 'prediction'
+        #hyper parameter search used by training: 'grid' or 'halving'
+        self.search_strategy = 'grid'
+        #MiniBatchKMeans for the elbow search of the number of clusters
+        self.fast_elbow = False
+        #rows the elbow search is fitted on, None uses the whole training set
+        self.elbow_sample_size = None
+        #save kmeans_elbow.png with the models of the training run
+        self.plot_elbow = False
+        #missing values imputation fitted on training: 'knn' or 'median'
+        self.imputer_strategy = 'knn'
+        #rows read and predicted at a time by batch prediction
+        self.batch_chunk_size = 50000
+        #batch prediction results written as 'csv', 'parquet' (needs pyarrow) or 'sqlite'
+        self.result_format = 'csv'
+        #/prediction requests wait up to this many ms to be scored together, 0 scores every request alone
+        self.prediction_batch_window_ms = 0
+        #most rows scored in one micro-batch
+        self.prediction_max_batch_size = 64
+        #serving: gunicorn workers (None: min(4, cpus)), threads per worker and request timeout in seconds
+        self.server_host = '0.0.0.0'
+        self.server_port = 5000
+        self.server_workers = None
+        self.server_threads = 8
+        self.server_timeout = 120
+        #background jobs running at once by kind, training stays 1 so two runs never share apps/models
+        self.job_limits = {'training': 1, 'batchprediction': 1}
     def get_run_id(self):
         """
         *method: get_run_id
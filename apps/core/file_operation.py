@@ -1,6 +1,8 @@
 import pickle
+import json
 import os
 import shutil
+import joblib
 from apps.core.logger import Logger
 
 
@@ -18,6 +20,9 @@ class FileOperation:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     native XGBoost and joblib artifacts with a manifest
+    *D. Rawlins    18-OCT-2026       1.2     models saved in a version directory, published by models.json
+    *D. Rawlins    18-OCT-2026       1.3     columns and encoder files published with the models
     *
     *
     *description: Class for configuration instance attributes
@@ -25,66 +30,232 @@ class FileOperation:
     **************************************************************************
     """
     
-    def __init__(self, run_id, data_path, mode):
+    def __init__(self, run_id, data_path, mode, version=None):
         self.run_id = run_id
         self.data_path = data_path
         self.logger = Logger(self.run_id, 'FileOperation', mode)
+        # models of a version are saved in apps/models/<version>, they are only used once
+        # models.json publishes the version. Without a version the models are directly in apps/models.
+        self.folder_name = 'apps/models'
+        self.version = version
+        self.models_dir = os.path.join(self.folder_name, version) if version else self.folder_name
+        self.published_file = os.path.join(self.folder_name, 'models.json')
     
-    def save_model(self, model, file_name):
+    def save_model(self, model, file_name, cluster=None, score=None):
         """
         *method: save_model
-        description: method to save model file
+        description: method to save model file. XGBoost models are saved in the native UBJSON format,
+        *             the other models with joblib so their arrays can be memory mapped on load. The
+        *             manifest.json is written last, a model directory without it is not complete.
         return: File gets saved
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     native/joblib artifact and manifest
+        *D. Rawlins    18-OCT-2026       1.2     saved in models_dir, only the directory of the model is replaced
         *
         *Parameters
         *   model:
         *   file_name:
+        *   cluster: cluster number of the model
+        *   score: test score of the model
         """
         try:
             self.logger.info('Start of Save Models')
-            path = os.path.join('apps/models/', file_name) #create separate directory per cluster
+            path = os.path.join(self.models_dir, file_name) #create separate directory per cluster
             if os.path.isdir(path):
-                shutil.rmtree('apps/models')
-                os.makedirs(path)
+                shutil.rmtree(path)
+            os.makedirs(path)
+            if type(model).__module__.startswith('xgboost'):
+                model_format = 'xgboost'
+                model_file = file_name+'.ubj'
+                model.save_model(path+'/'+model_file)
             else:
-                os.makedirs(path)
-            with open(path+'/'+file_name+'.sav',
-                      'wb') as f:
-                pickle.dump(model, f)
+                model_format = 'joblib'
+                model_file = file_name+'.joblib'
+                #not compressed, compressed arrays can not be memory mapped
+                joblib.dump(model, path+'/'+model_file)
+            features = getattr(model, 'feature_names_in_', None)
+            manifest = {'name': file_name,
+                        'format': model_format,
+                        'file': model_file,
+                        'algorithm': type(model).__name__,
+                        'cluster': cluster,
+                        'features': [str(f) for f in features] if features is not None else None,
+                        'score': float(score) if score is not None else None}
+            with open(path+'/manifest.json.tmp', 'w') as f:
+                f.write(json.dumps(manifest))
+            os.replace(path+'/manifest.json.tmp', path+'/manifest.json')
             self.logger.info('Model File '+file_name+' saved')
             self.logger.info('End of Save Models')
             return 'success'
         except Exception as e:
             self.logger.exception('Exception raised while Save Models: %s' %e)
             raise Exception()
+
+    def load_manifest(self, file_name):
+        """
+        * method: load_manifest
+        * description: method to read the manifest of a model
+        * return: manifest dictionary, None for models saved as .sav pickle
+        *
+        * who           when           version   change (include bug# if apply)
+        * ---------     -----------    -------   ------------------------------
+        * D. Rawlins    18-OCT-2026       1.0     initial creation
+        * D. Rawlins    18-OCT-2026       1.1     read from models_dir
+        *
+        * Parameters
+        *   file_name:
+        """
+        manifest_file = os.path.join(self.models_dir, file_name, 'manifest.json')
+        if not os.path.isfile(manifest_file):
+            return None
+        with open(manifest_file, 'r') as f:
+            return json.load(f)
         
+    def model_exists(self, file_name):
+        """
+        * method: model_exists
+        * description: method to check a model is completely saved, with its manifest or as .sav pickle
+        * return: True if saved
+        *
+        * who           when           version   change (include bug# if apply)
+        * ---------     -----------    -------   ------------------------------
+        * D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        * Parameters
+        *   file_name:
+        """
+        path = os.path.join(self.models_dir, file_name)
+        return os.path.isfile(os.path.join(path, 'manifest.json')) or os.path.isfile(os.path.join(path, file_name+'.sav'))
+
     def load_model(self, file_name):
         """
         * method: load_model
-        * description: method to load model file
+        * description: method to load model file. joblib arrays are memory mapped read only, so the
+        *              worker processes share their pages.
         * return: File gets saved
         *
         * who           when           version   change (include bug# if apply)
         * ---------     -----------    -------   ------------------------------
         * D. Rawlins    12-JAN-2024       1.0     initial creation
+        * D. Rawlins    18-OCT-2026       1.1     load the artifact named by the manifest
+        * D. Rawlins    18-OCT-2026       1.2     load from models_dir
+        * D. Rawlins    18-OCT-2026       1.3     XGBoost models loaded single threaded
         *
         * Parameters
         *   file_name:
         """
         try:
             self.logger.info('Start of Load Model')
-            with open('apps/models/'+file_name+'/'+file_name+'.sav','rb') as f:
-                self.logger.info('Model File '+ file_name +' loaded')
-                self.logger.info('End of Load Model')
-                return pickle.load(f)
+            path = os.path.join(self.models_dir, file_name)+'/'
+            manifest = self.load_manifest(file_name)
+            if manifest is None:
+                with open(path+file_name+'.sav','rb') as f:
+                    model = pickle.load(f)
+            elif manifest['format'] == 'xgboost':
+                import xgboost
+                #the json file does not keep n_jobs, the default would use every core on each predict
+                model = getattr(xgboost, manifest['algorithm'])(n_jobs=1)
+                model.load_model(path+manifest['file'])
+            else:
+                model = joblib.load(path+manifest['file'], mmap_mode='r')
+            self.logger.info('Model File '+ file_name +' loaded')
+            self.logger.info('End of Load Model')
+            return model
         except Exception as e:
             self.logger.exception('Exception raised while loading Model: %s' %e)
             raise Exception()
         
+    def publish_models(self, kmeans, imputer, clusters, columns=None, encoder=None):
+        """
+        * method: publish_models
+        * description: method to make the models of this version the served ones. The version is
+        *              checked to be complete and apps/models/models.json is replaced in one rename, a
+        *              reader sees either the previous set of models or the new one. The directories
+        *              older than the previous version are removed.
+        * return: published models dictionary
+        *
+        * who           when           version   change (include bug# if apply)
+        * ---------     -----------    -------   ------------------------------
+        * D. Rawlins    18-OCT-2026       1.0     initial creation
+        * D. Rawlins    18-OCT-2026       1.1     columns and encoder files of the version
+        *
+        * Parameters
+        *   kmeans: model name of the KMeans model
+        *   imputer: model name of the imputer, None when there is none
+        *   clusters: model name by cluster number
+        *   columns: columns.json file name in the version directory
+        *   encoder: encoder.json file name in the version directory
+        """
+        try:
+            self.logger.info('Start of Publish Models')
+            if not self.version:
+                raise ValueError('Only a model version can be published')
+            names = [kmeans]+list(clusters.values())+([imputer] if imputer else [])
+            incomplete = [name for name in names if not self.model_exists(name)]
+            incomplete += [name for name in (columns, encoder) if name and not os.path.isfile(os.path.join(self.models_dir, name))]
+            if incomplete:
+                raise ValueError('Models not saved: '+str(incomplete))
+            previous = self.load_published()
+            published = {'version': self.version,
+                         'kmeans': kmeans,
+                         'imputer': imputer,
+                         'clusters': {str(cluster): name for cluster, name in sorted(clusters.items())},
+                         'columns': columns,
+                         'encoder': encoder}
+            with open(self.published_file+'.tmp', 'w') as f:
+                f.write(json.dumps(published))
+            os.replace(self.published_file+'.tmp', self.published_file)
+            self.logger.info('Models version '+self.version+' published')
+            #the previous version is kept for the processes that did not reload yet
+            keep = {self.version, previous['version'] if previous else None}
+            for name in os.listdir(self.folder_name):
+                if name not in keep and os.path.isdir(os.path.join(self.folder_name, name)):
+                    shutil.rmtree(os.path.join(self.folder_name, name), ignore_errors=True)
+            self.logger.info('End of Publish Models')
+            return published
+        except Exception as e:
+            self.logger.exception('Exception raised while Publish Models: %s' %e)
+            raise e
+
+    def load_published(self):
+        """
+        * method: load_published
+        * description: method to read apps/models/models.json
+        * return: published models dictionary, None when the models were never published
+        *
+        * who           when           version   change (include bug# if apply)
+        * ---------     -----------    -------   ------------------------------
+        * D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        * Parameters
+        *   none:
+        """
+        if not os.path.isfile(self.published_file):
+            return None
+        with open(self.published_file, 'r') as f:
+            return json.load(f)
+
+    def discard_models(self):
+        """
+        * method: discard_models
+        * description: method to remove the models of an unpublished version
+        * return: none
+        *
+        * who           when           version   change (include bug# if apply)
+        * ---------     -----------    -------   ------------------------------
+        * D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        * Parameters
+        *   none:
+        """
+        published = self.load_published()
+        if self.version and not (published and published['version'] == self.version):
+            shutil.rmtree(self.models_dir, ignore_errors=True)
+            self.logger.info('Models version '+self.version+' discarded')
+
     def correct_model(self, cluster_number):
         """
         * method: correct_model
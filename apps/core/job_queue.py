@@ -0,0 +1,372 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from apps.core.logger import Logger
+from apps.database.connection_pool import ConnectionPool
+
+
+class JobQueue:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       job_queue.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     jobs of dead processes released when a job is claimed
+    *D. Rawlins    18-OCT-2026       1.2     queued jobs of dead processes failed by claim and status
+    *
+    *
+    *description: Class to run training and batch prediction as background
+    *             jobs. A job is recorded in the jobs table of a sqlite
+    *             database, run by a local thread pool of its kind and only
+    *             starts once fewer than limit jobs of that kind are running,
+    *             counted in the database so the limit holds across the server
+    *             workers. The job state stays available after the run.
+    *
+    **************************************************************************
+    """
+    def __init__(self, run_id, limits, database_file='apps/database/jobs.db', poll_interval=1.0):
+        self.run_id = run_id
+        # maximum number of running jobs by kind
+        self.limits = dict(limits)
+        self.database_file = database_file
+        self.poll_interval = poll_interval
+        self.logger = Logger(self.run_id, 'JobQueue', 'prediction')
+        self.lock = threading.Lock()
+        self.executors = {}
+        self.pid = None
+        self.create_table()
+        self.recover()
+
+    def connection(self):
+        """
+        *method: connection
+        *description: method to get a pooled connection to the jobs database
+        *return: PooledConnection
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        return ConnectionPool.get_pool(self.database_file).acquire()
+
+    def create_table(self):
+        """
+        *method: create_table
+        *description: method to create the jobs table
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        conn = self.connection()
+        try:
+            with conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS jobs (run_id TEXT PRIMARY KEY, kind TEXT NOT NULL, '
+                             'status TEXT NOT NULL, pid INTEGER, submitted TEXT, started TEXT, finished TEXT, '
+                             'result TEXT, error TEXT)')
+                conn.execute('CREATE INDEX IF NOT EXISTS jobs_kind_status ON jobs (kind, status)')
+        except Exception as e:
+            self.logger.exception('Exception raised while creating jobs table: %s' %e)
+            raise e
+        finally:
+            conn.close()
+
+    def process_alive(self, pid):
+        """
+        *method: process_alive
+        *description: method to check if the process that submitted a job still runs
+        *return: True if alive
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   pid:
+        """
+        if pid == os.getpid():
+            return True
+        #on Windows signal 0 terminates the process, and the server runs in a single process there
+        if os.name == 'nt':
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def recover(self):
+        """
+        *method: recover
+        *description: method to fail the queued and running jobs of processes that are gone, they
+        *             would otherwise hold their slot of the limit forever
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     jobs failed by fail_interrupted
+        *
+        *Parameters
+        *   none:
+        """
+        conn = self.connection()
+        try:
+            with conn:
+                jobs = conn.execute("SELECT run_id, pid FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+                self.fail_interrupted(conn, jobs)
+        except Exception as e:
+            self.logger.exception('Exception raised while recovering jobs: %s' %e)
+            raise e
+        finally:
+            conn.close()
+
+    def fail_interrupted(self, conn, jobs):
+        """
+        *method: fail_interrupted
+        *description: method to mark failed the jobs whose process is gone, in the transaction of conn
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   conn:
+        *   jobs: list of (run_id, pid)
+        """
+        for run_id, pid in jobs:
+            if pid is None or not self.process_alive(pid):
+                conn.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE run_id = ?",
+                             (self.now(), 'interrupted, the process running the job stopped', run_id))
+                self.logger.info('Job '+run_id+' interrupted')
+
+    def now(self):
+        """
+        *method: now
+        *description: method to get the time stamp stored with the job states
+        *return: current local time, iso format
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        return datetime.now().isoformat(timespec='seconds')
+
+    def get_executor(self, kind):
+        """
+        *method: get_executor
+        *description: method to get the thread pool of a job kind. Threads do not survive fork, a
+        *             pre-forked server worker creates its own pools.
+        *return: ThreadPoolExecutor
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   kind:
+        """
+        with self.lock:
+            if self.pid != os.getpid():
+                self.executors = {}
+                self.pid = os.getpid()
+            if kind not in self.executors:
+                self.executors[kind] = ThreadPoolExecutor(max_workers=self.limits[kind], thread_name_prefix='Job_'+kind)
+            return self.executors[kind]
+
+    def submit(self, kind, run_id, target):
+        """
+        *method: submit
+        *description: method to record a job and queue it, returns without waiting for the run
+        *return: run_id of the job
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   kind: 'training' or 'batchprediction'
+        *   run_id: run id of the job
+        *   target: callable running the job, returns a json serializable result
+        """
+        if kind not in self.limits:
+            raise KeyError(kind)
+        conn = self.connection()
+        try:
+            with conn:
+                conn.execute("INSERT INTO jobs (run_id, kind, status, pid, submitted) VALUES (?, ?, 'queued', ?, ?)",
+                             (run_id, kind, os.getpid(), self.now()))
+        except Exception as e:
+            self.logger.exception('Exception raised while submitting job: %s' %e)
+            raise e
+        finally:
+            conn.close()
+        self.get_executor(kind).submit(self.run, kind, run_id, target)
+        self.logger.info('Job '+run_id+' queued: '+kind)
+        return run_id
+
+    def claim(self, kind, run_id):
+        """
+        *method: claim
+        *description: method to mark a queued job as running if fewer than limit jobs of its kind run.
+        *             A job left queued or running by a crashed or killed worker does not count, it is
+        *             failed first.
+        *return: True if the job can start
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     fail the running jobs of dead processes
+        *D. Rawlins    18-OCT-2026       1.2     fail the queued jobs of dead processes
+        *
+        *Parameters
+        *   kind:
+        *   run_id:
+        """
+        conn = self.connection()
+        try:
+            #the write lock is taken before counting, two workers cannot both see a free slot
+            conn.execute('BEGIN IMMEDIATE')
+            #recover only runs in the process that starts the server, a worker restarted by gunicorn
+            #leaves its queued jobs behind as well
+            jobs = conn.execute("SELECT run_id, pid FROM jobs WHERE kind = ? AND status IN ('queued', 'running')",
+                                (kind,)).fetchall()
+            self.fail_interrupted(conn, jobs)
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE kind = ? AND status = 'running'", (kind,)).fetchone()[0]
+            if running >= self.limits[kind]:
+                conn.rollback()
+                return False
+            conn.execute("UPDATE jobs SET status = 'running', pid = ?, started = ? WHERE run_id = ?",
+                         (os.getpid(), self.now(), run_id))
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    def finish(self, run_id, status, result=None, error=None):
+        """
+        *method: finish
+        *description: method to record the end of a job
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   run_id:
+        *   status: 'finished' or 'failed'
+        *   result: json serializable result
+        *   error: error message
+        """
+        conn = self.connection()
+        try:
+            with conn:
+                conn.execute('UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE run_id = ?',
+                             (status, self.now(), None if result is None else json.dumps(result), error, run_id))
+        finally:
+            conn.close()
+
+    def run(self, kind, run_id, target):
+        """
+        *method: run
+        *description: method of the pool threads, waits for a free slot of the kind and runs the job
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   kind:
+        *   run_id:
+        *   target:
+        """
+        try:
+            #a job of the same kind may run in another server worker
+            while not self.claim(kind, run_id):
+                time.sleep(self.poll_interval)
+            self.logger.info('Job '+run_id+' started: '+kind)
+            result = target(run_id)
+            self.finish(run_id, 'finished', result)
+            self.logger.info('Job '+run_id+' finished')
+        except Exception as e:
+            self.logger.exception('Job '+run_id+' failed: %s' %e)
+            self.finish(run_id, 'failed', error=str(e) or type(e).__name__)
+
+    def status(self, run_id):
+        """
+        *method: status
+        *description: method to get the state of a job, a queued or running job whose process is gone
+        *             is failed first
+        *return: dict of the job columns, None for an unknown run_id
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     fail the job of a dead process
+        *
+        *Parameters
+        *   run_id:
+        """
+        conn = self.connection()
+        try:
+            with conn:
+                jobs = conn.execute("SELECT run_id, pid FROM jobs WHERE run_id = ? AND status IN ('queued', 'running')",
+                                    (run_id,)).fetchall()
+                self.fail_interrupted(conn, jobs)
+            cursor = conn.execute('SELECT run_id, kind, status, submitted, started, finished, result, error '
+                                  'FROM jobs WHERE run_id = ?', (run_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            job = dict(zip([column[0] for column in cursor.description], row))
+            job['result'] = None if job['result'] is None else json.loads(job['result'])
+            return job
+        finally:
+            conn.close()
+
+    def latest_finished(self, kind):
+        """
+        *method: latest_finished
+        *description: method to get the last finished job of a kind, its output replaced the older ones
+        *return: run_id, None when no job of the kind finished
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   kind:
+        """
+        conn = self.connection()
+        try:
+            row = conn.execute("SELECT run_id FROM jobs WHERE kind = ? AND status = 'finished' "
+                               "ORDER BY finished DESC, rowid DESC LIMIT 1", (kind,)).fetchone()
+            return None if row is None else row[0]
+        finally:
+            conn.close()
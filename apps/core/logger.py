@@ -15,6 +15,7 @@ class Logger:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     do not add a second handler to the same logger
     *
     *
     *description: Class for configuration instance attributes
@@ -24,6 +25,9 @@ class Logger:
     def __init__ (self, run_id, log_module, log_file_name):
         self.logger = logging.getLogger(str(log_module)+'_'+str(run_id))
         self.logger.setLevel(logging.DEBUG)
+        #the same module and run id share one logger, only the first object adds the file handler
+        if self.logger.handlers:
+            return
         if log_file_name == 'training':
             file_handler = logging.FileHandler('logs/training_logs/train_log_'+str(run_id)+'.log')
         else:
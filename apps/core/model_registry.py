@@ -0,0 +1,334 @@
+import os
+import re
+import threading
+from apps.core.logger import Logger
+from apps.core.file_operation import FileOperation
+from apps.preprocess.feature_layout import FeatureLayout
+
+
+class ModelSet:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       model_registry.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *
+    *description: Class to hold one loaded version of the models: KMeans, the
+    *             imputer, the feature layout the models were trained on and the
+    *             model names by cluster, with the file operation of their version
+    *             directory. A request takes one set
+    *             and uses it to the end, a refresh builds a new set instead of
+    *             changing this one. A cluster model is only loaded the first
+    *             time its cluster is predicted.
+    *
+    **************************************************************************
+    """
+    def __init__(self, run_id, mode, version, kmeans, imputer, layout, model_names, fileOperation):
+        self.run_id = run_id
+        self.version = version
+        self.kmeans = kmeans
+        self.imputer = imputer
+        # compiled FeatureLayout of the columns and encoder files of the version
+        self.layout = layout
+        # model directory by cluster number, and the cluster models loaded so far
+        self.model_names = dict(model_names)
+        self.models = {}
+        self.fileOperation = fileOperation
+        self.lock = threading.Lock()
+        self.logger = Logger(self.run_id, 'ModelSet', mode)
+
+    def complete(self):
+        """
+        *method: complete
+        *description: method to check there is a model for every cluster of KMeans
+        *return: True if complete
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        return set(range(self.kmeans.n_clusters)) <= set(self.model_names)
+
+    def get_cluster_model(self, cluster_number):
+        """
+        *method: get_cluster_model
+        *description: method to get the model trained for a cluster, loaded on the first call
+        *return: The Model of the cluster
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   cluster_number:
+        """
+        cluster_number = int(cluster_number)
+        if cluster_number in self.models:
+            return self.models[cluster_number]
+        with self.lock:
+            if cluster_number not in self.models:
+                if cluster_number not in self.model_names:
+                    self.logger.info('Model not found for cluster '+str(cluster_number))
+                    raise KeyError(cluster_number)
+                self.models[cluster_number] = self.fileOperation.load_model(self.model_names[cluster_number])
+            return self.models[cluster_number]
+
+    def preload(self):
+        """
+        *method: preload
+        *description: method to load every cluster model now instead of on first use
+        *return: list of the loaded cluster numbers
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        clusters = sorted(self.model_names)
+        for cluster_number in clusters:
+            self.get_cluster_model(cluster_number)
+        return clusters
+
+
+class ModelRegistry:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       model_registry.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     fitted imputer
+    *D. Rawlins    18-OCT-2026       1.2     model manifests, cluster models loaded on first use
+    *D. Rawlins    18-OCT-2026       1.3     preload before the server forks
+    *D. Rawlins    18-OCT-2026       1.4     published model version, complete sets only
+    *D. Rawlins    18-OCT-2026       1.5     models handed out as one ModelSet snapshot
+    *D. Rawlins    18-OCT-2026       1.6     feature layout of the version loaded with its models
+    *
+    *
+    *description: Class to keep the KMeans model, the imputer and the per-cluster models in
+    *             memory for the whole process. The models are loaded once and
+    *             reloaded only when the files under apps/models change, and only
+    *             swapped to a complete set. The models are handed out together as
+    *             a ModelSet, so a prediction never mixes two versions.
+    *
+    **************************************************************************
+    """
+    # process-wide cache shared by every registry instance
+    _lock = threading.Lock()
+    _stamp = None
+    # ModelSet of the loaded version
+    _modelSet = None
+
+    def __init__(self, run_id, data_path, mode):
+        self.run_id = run_id
+        self.data_path = data_path
+        self.folder_name = 'apps/models'
+        self.mode = mode
+        self.logger = Logger(self.run_id, 'ModelRegistry', mode)
+        self.fileOperation = FileOperation(self.run_id, self.data_path, mode)
+
+    def models_stamp(self):
+        """
+        *method: models_stamp
+        *description: method to build the version stamp of the model files. Published models are stamped
+        *             by models.json alone, it is replaced last. Otherwise the manifest of every model
+        *             directory stamps it, .sav for pickled models.
+        *return: tuple with name, size and mtime of the stamped files
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     stamp the manifest, .sav for pickled models
+        *D. Rawlins    18-OCT-2026       1.2     stamp models.json of the published version
+        *
+        *Parameters
+        *   none:
+        """
+        if os.path.isfile(self.fileOperation.published_file):
+            stat = os.stat(self.fileOperation.published_file)
+            return (('models.json', stat.st_size, stat.st_mtime_ns),)
+        stamp = []
+        for model_name in sorted(os.listdir(self.folder_name)):
+            file = os.path.join(self.folder_name, model_name, 'manifest.json')
+            if not os.path.isfile(file):
+                file = os.path.join(self.folder_name, model_name, model_name+'.sav')
+            if os.path.isfile(file):
+                stat = os.stat(file)
+                stamp.append((model_name, stat.st_size, stat.st_mtime_ns))
+        return tuple(stamp)
+
+    def find_models(self, stamp):
+        """
+        *method: find_models
+        *description: method to find the models of the directories of apps/models, for models trained
+        *             before models.json
+        *return: KMeans name, imputer name and model name by cluster number
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   stamp: models_stamp
+        """
+        kmeans = None
+        imputer = None
+        model_names = {}
+        for model_name, size, mtime in stamp:
+            if model_name == 'KMeans':
+                kmeans = model_name
+                continue
+            if model_name == 'Imputer':
+                imputer = model_name
+                continue
+            manifest = self.fileOperation.load_manifest(model_name)
+            if manifest is not None and manifest.get('cluster') is not None:
+                model_names[int(manifest['cluster'])] = model_name
+                continue
+            cluster_number = re.search(r'(\d+)$', model_name)
+            if cluster_number is not None:
+                model_names[int(cluster_number.group(1))] = model_name
+        return kmeans, imputer, model_names
+
+    def refresh(self):
+        """
+        *method: refresh
+        *description: method to (re)load the models when the files under apps/models changed. The cache is
+        *             only swapped to a complete set: KMeans, the imputer when there is one, a model for
+        *             every cluster and the feature layout, otherwise the models loaded before are kept.
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     cluster models from the manifests, loaded by get_cluster_model
+        *D. Rawlins    18-OCT-2026       1.2     published version from models.json, only complete sets
+        *D. Rawlins    18-OCT-2026       1.3     the loaded version replaced as one ModelSet
+        *D. Rawlins    18-OCT-2026       1.4     feature layout of the columns and encoder files of the version
+        *
+        *Parameters
+        *   none:
+        """
+        stamp = self.models_stamp()
+        if stamp == ModelRegistry._stamp:
+            return
+        with ModelRegistry._lock:
+            if stamp == ModelRegistry._stamp:
+                return
+            try:
+                self.logger.info('Start of Loading Models into registry')
+                published = self.fileOperation.load_published()
+                version = None
+                #models trained before the layout was versioned use the files of apps/database
+                columns_file, encoder_file = 'apps/database/columns.json', 'apps/database/encoder.json'
+                if published is not None:
+                    version = published['version']
+                    fileOperation = FileOperation(self.run_id, self.data_path, self.mode, version)
+                    kmeans_name, imputer_name = published['kmeans'], published['imputer']
+                    model_names = {int(cluster): name for cluster, name in published['clusters'].items()}
+                    if published.get('columns'):
+                        columns_file = os.path.join(fileOperation.models_dir, published['columns'])
+                    if published.get('encoder'):
+                        encoder_file = os.path.join(fileOperation.models_dir, published['encoder'])
+                else:
+                    fileOperation = self.fileOperation
+                    kmeans_name, imputer_name, model_names = self.find_models(stamp)
+                if kmeans_name is None:
+                    raise KeyError('KMeans')
+                kmeans = fileOperation.load_model(kmeans_name)
+                imputer = fileOperation.load_model(imputer_name) if imputer_name else None
+                missing = sorted(set(range(kmeans.n_clusters)) - set(model_names))
+                missing += [name for name in model_names.values() if not fileOperation.model_exists(name)]
+                if missing:
+                    raise KeyError('Models missing: '+str(missing))
+                layout = FeatureLayout(self.run_id, self.data_path, self.mode, columns_file, encoder_file)
+                layout.load()
+                # only swap the cache once the set is complete, an incomplete one keeps the old models
+                ModelRegistry._modelSet = ModelSet(self.run_id, self.mode, version, kmeans, imputer, layout,
+                                                   model_names, fileOperation)
+                ModelRegistry._stamp = stamp
+                self.logger.info('Models found for clusters: '+str(sorted(model_names)))
+                self.logger.info('End of Loading Models into registry')
+            except Exception as e:
+                self.logger.exception('Exception raised while Loading Models into registry: %s' %e)
+                if ModelRegistry._modelSet is None:
+                    raise Exception()
+
+    def snapshot(self):
+        """
+        *method: snapshot
+        *description: method to get the loaded models, refreshed first. A prediction takes one snapshot
+        *             and uses it for every row, a version published meanwhile is only seen by the next one.
+        *return: ModelSet
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        self.refresh()
+        modelSet = ModelRegistry._modelSet
+        if modelSet is None:
+            self.logger.info('KMeans model not found in '+self.folder_name)
+            raise KeyError('KMeans')
+        return modelSet
+
+    def complete(self):
+        """
+        *method: complete
+        *description: method to check a complete set of models is loaded
+        *return: True if complete
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     checked on the snapshot
+        *
+        *Parameters
+        *   none:
+        """
+        try:
+            modelSet = self.snapshot()
+        except Exception:
+            return False
+        #refresh only swaps to complete sets, checked again on the set a prediction would get
+        return modelSet.complete()
+
+    def preload(self):
+        """
+        *method: preload
+        *description: method to load every cluster model now instead of on first use
+        *return: list of the loaded cluster numbers
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     models of the snapshot
+        *
+        *Parameters
+        *   none:
+        """
+        return self.snapshot().preload()
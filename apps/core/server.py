@@ -0,0 +1,87 @@
+import os
+from socketserver import ThreadingMixIn
+from wsgiref import simple_server
+from apps.core.logger import Logger
+
+
+class ThreadingWSGIServer(ThreadingMixIn, simple_server.WSGIServer):
+    # one thread per request, the threads do not keep the process alive
+    daemon_threads = True
+
+
+class Server:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       server.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *
+    *description: Class to serve the Flask app. With gunicorn installed it
+    *             runs a pre-forking server of workers x threads, the app and
+    *             its models are loaded once in the master before the workers
+    *             fork so the model pages are shared copy-on-write. Without
+    *             gunicorn (Windows) it falls back to a threaded wsgiref server.
+    *
+    **************************************************************************
+    """
+    def __init__(self, app, run_id, host='0.0.0.0', port=5000, workers=None, threads=8, timeout=120):
+        self.app = app
+        self.run_id = run_id
+        self.host = host
+        self.port = port
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.threads = threads
+        self.timeout = timeout
+        self.logger = Logger(self.run_id, 'Server', 'prediction')
+
+    def run(self):
+        """
+        *method: run
+        *description: method to serve the app until the process is stopped
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            self.logger.info('gunicorn not installed, serving with threaded wsgiref on %s:%s' %(self.host, self.port))
+            httpd = simple_server.make_server(self.host, self.port, self.app, server_class=ThreadingWSGIServer)
+            httpd.serve_forever()
+            return
+
+        app = self.app
+        options = {
+            'bind': '%s:%s' %(self.host, self.port),
+            'workers': self.workers,
+            'worker_class': 'gthread',
+            'threads': self.threads,
+            'timeout': self.timeout,
+            #the app is already built in this process, the workers fork from it
+            'preload_app': True,
+        }
+
+        class Application(BaseApplication):
+            def load_config(self):
+                for key, value in options.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                return app
+
+        self.logger.info('Serving with gunicorn on %s: %s' %(options['bind'], options))
+        Application().run()
@@ -0,0 +1,163 @@
+import os
+import queue
+import sqlite3
+import threading
+
+
+class PooledConnection(sqlite3.Connection):
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       connection_pool.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *
+    *description: sqlite connection that goes back to its pool on close, so
+    *             the callers keep opening and closing connections as before.
+    *
+    **************************************************************************
+    """
+    pool = None
+    idle = False
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            super().close()
+
+
+class ConnectionPool:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       connection_pool.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     new pools in a forked process
+    *
+    *
+    *description: Class to keep open sqlite connections per database file for
+    *             the whole process. Connections are set up once with WAL
+    *             journaling, a large page cache and memory mapped reads, and
+    *             are handed to one thread at a time.
+    *
+    **************************************************************************
+    """
+    # process-wide pools by database file
+    _lock = threading.Lock()
+    _pools = {}
+
+    pragmas = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA cache_size=-65536',
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA temp_store=MEMORY',
+    )
+
+    def __init__(self, database_file, max_size=8, timeout=30):
+        self.database_file = database_file
+        self.timeout = timeout
+        # sqlite connections must not be used across fork, a forked worker opens its own
+        self.pid = os.getpid()
+        self.connections = queue.LifoQueue(maxsize=max_size)
+
+    @classmethod
+    def get_pool(cls, database_file):
+        """
+        *method: get_pool
+        *description: method to get the pool of a database file, created on first use
+        *return: ConnectionPool
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     pools of the parent process are not reused after fork
+        *
+        *Parameters
+        *   database_file:
+        """
+        with cls._lock:
+            if database_file not in cls._pools or cls._pools[database_file].pid != os.getpid():
+                cls._pools[database_file] = cls(database_file)
+            return cls._pools[database_file]
+
+    def connect(self):
+        """
+        *method: connect
+        *description: method to open a new connection and apply the pragmas
+        *return: PooledConnection
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        #the connection moves between request threads, but only one thread holds it at a time
+        conn = sqlite3.connect(self.database_file, timeout=self.timeout, check_same_thread=False, factory=PooledConnection)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        """
+        *method: acquire
+        *description: method to take an idle connection, a new one is opened when none is idle
+        *return: PooledConnection
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        try:
+            conn = self.connections.get_nowait()
+        except queue.Empty:
+            conn = self.connect()
+        conn.idle = False
+        return conn
+
+    def release(self, conn):
+        """
+        *method: release
+        *description: method to give a connection back, an open transaction is rolled back first
+        *return: True if the connection is kept idle, False if the pool is full and it has to be closed
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   conn:
+        """
+        #closing a connection twice must not hand it to two threads
+        if conn.idle:
+            return True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.idle = True
+            self.connections.put_nowait(conn)
+            return True
+        except (queue.Full, sqlite3.Error):
+            conn.idle = False
+            return False
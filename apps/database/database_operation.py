@@ -1,10 +1,9 @@
-import sqlite3
 import csv
-from os import listdir
-import shutil
+import pandas as pd
 import os
 
 from apps.core.logger import Logger
+from apps.database.connection_pool import ConnectionPool
 
 class DatabaseOperation:
     """_summary_
@@ -20,6 +19,12 @@ class DatabaseOperation:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     ingestion manifest and upserts on a key column
+    *D. Rawlins    18-OCT-2026       1.2     streaming export_csv, read_table
+    *D. Rawlins    18-OCT-2026       1.3     pooled connections with WAL pragmas
+    *D. Rawlins    18-OCT-2026       1.4     "NULL" strings replaced by SQL NULL
+    *D. Rawlins    18-OCT-2026       1.5     insert_data removed, files are loaded by LoadValidate
+    *D. Rawlins    18-OCT-2026       1.6     pooled connections released on errors
     *
     *
     *description: Class to handle database operations
@@ -41,12 +46,14 @@ class DatabaseOperation:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     connection from the ConnectionPool of the database
         *
         *Parameters
         *   database_name:
         """
         try:
-            conn = sqlite3.connect('apps/database/'+database_name+'.db')
+            #pooled connection, close() gives it back to the pool of the database
+            conn = ConnectionPool.get_pool('apps/database/'+database_name+'.db').acquire()
             self.logger.info("Opened %s database successfully" %database_name)
         except ConnectionError:
             self.logger.info("Error while connecting to database: %s" %ConnectionError)
@@ -61,11 +68,13 @@ class DatabaseOperation:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     connection released on errors
         *
         *Parameters
         *   database_name:
         *   column_names:
         """
+        conn = None
         try:
             self.logger.info('Start of Creating Table...')
             conn = self.database_connection(database_name)
@@ -77,7 +86,6 @@ class DatabaseOperation:
             c.execute("SELECT count(name) FROM sqlite_master WHERE type = 'table' AND name = '"+table_name+"'")
             
             if c.fetchone()[0] == 1:
-                conn.close()
                 self.logger.info('Tables created successfully')
                 self.logger.info("Closed %s database successfully" %database_name)
             else:
@@ -92,57 +100,165 @@ class DatabaseOperation:
                     except:
                         conn.execute("CREATE TABLE "+table_name+" ({column_name} {dataType})".format(column_name = key, dataType = type))
                         self.logger.info("CREATE TABLE "+table_name+" column_name")
-                conn.close()
             self.logger.info('End of Creating Table...')
              
         except Exception as e:
             self.logger.exception('Exception raised while Creating Table: %s' %e)
             raise e
-    def insert_data(self, database_name, table_name):
+        finally:
+            if conn is not None:
+                conn.close()
+    def create_manifest(self, conn):
         """
-        *method: insert_data
-        *description: method to insert data into database table
+        *method: create_manifest
+        *description: method to create the table of the files already loaded
         *return: none
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
-        *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
         *
         *Parameters
-        *   database_name:
+        *   conn:
         """
-        conn = self.database_connection(database_name)
-        good_data_path = self.data_path
-        bad_data_path = self.data_path+'_rejects'
-        only_files = [f for f in listdir(good_data_path)]
-        self.logger.info('Start of Inserting Data into Table...')
-        for file in only_files:
-            try:
-                with open(good_data_path+'/'+file,"r") as f:
-                    next(f)
-                    reader = csv.reader(f, delimiter = ",")
-                    for line in enumerate(reader):
-                        #self.logger.info(" %s: nu!!" %line[1])
-                        to_db = ''
-                        for list_ in (line[1]):
-                            try:
-                                to_db = to_db +",'"+list_+"'"
-                            except Exception as e:
-                                raise e
-                        #self.logger.info(" %s: list_!!" %to_db.lstrip(','))
-                        to_db = to_db.lstrip(',')
-                        conn.execute("INSERT INTO "+table_name+" values ({values})".format(values = (to_db)))
-                        conn.commit()
-                        
-            except Exception as e:
-                conn.rollback()
-                self.logger.exception('Exception raised while Inserting Data into Table: %s'%e)
-                shutil.move(good_data_path+'/'+file,bad_data_path)
-                conn.close()
-        conn.close()
-        self.logger.info('End of Inserting Data into Table...')
-    
-    def export_csv(self, database_name, table_name):
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS ingestion_manifest (file_name TEXT PRIMARY KEY, size INTEGER, "
+                         "mtime INTEGER, hash TEXT, rows INTEGER, loaded_at TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ingestion_manifest_hash ON ingestion_manifest (hash)")
+
+    def manifest_match(self, conn, file_name, size, mtime, file_hash=None):
+        """
+        *method: manifest_match
+        *description: method to check if a file was already loaded, by name, size and mtime or by content hash
+        *return: True if the file was already loaded
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   conn:
+        *   file_name:
+        *   size:
+        *   mtime:
+        *   file_hash: checked only when given
+        """
+        if file_hash is None:
+            c = conn.execute("SELECT 1 FROM ingestion_manifest WHERE file_name = ? AND size = ? AND mtime = ?", (file_name, size, mtime))
+        else:
+            c = conn.execute("SELECT 1 FROM ingestion_manifest WHERE hash = ?", (file_hash,))
+        return c.fetchone() is not None
+
+    def manifest_record(self, conn, file_name, size, mtime, file_hash, rows):
+        """
+        *method: manifest_record
+        *description: method to record a loaded file in the manifest
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   conn:
+        *   file_name:
+        *   size:
+        *   mtime:
+        *   file_hash:
+        *   rows:
+        """
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO ingestion_manifest VALUES (?, ?, ?, ?, ?, datetime('now'))",
+                         (file_name, size, mtime, file_hash, rows))
+
+    def clear_null_strings(self, conn, table_name):
+        """
+        *method: clear_null_strings
+        *description: method to replace the "NULL" strings stored by the text inserts with SQL NULL.
+        *             It runs once per database, user_version records that it was done.
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   conn:
+        *   table_name:
+        """
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+            return
+        with conn:
+            for row in conn.execute("PRAGMA table_info("+table_name+")").fetchall():
+                conn.execute("UPDATE "+table_name+" SET "+row[1]+" = NULL WHERE "+row[1]+" = 'NULL'")
+            conn.execute("PRAGMA user_version = 1")
+        self.logger.info('"NULL" strings replaced by NULL in '+table_name)
+
+    def create_unique_key(self, conn, table_name, key):
+        """
+        *method: create_unique_key
+        *description: method to create the unique index used by the upserts. Rows appended again by
+        *             earlier loads are removed first, the last loaded row of every key is kept. Rows
+        *             without a key are not duplicates of each other and are all kept.
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     NULL keys left out of the dedupe
+        *
+        *Parameters
+        *   conn:
+        *   table_name:
+        *   key:
+        """
+        index_name = table_name+'_'+key+'_u'
+        c = conn.execute("SELECT count(name) FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+        if c.fetchone()[0] == 1:
+            return
+        with conn:
+            #GROUP BY puts every NULL key in one group, those rows are not compared
+            c = conn.execute("DELETE FROM "+table_name+" WHERE "+key+" IS NOT NULL AND rowid NOT IN "
+                             "(SELECT MAX(rowid) FROM "+table_name+" WHERE "+key+" IS NOT NULL GROUP BY "+key+")")
+            self.logger.info('%d duplicated rows removed from %s' %(c.rowcount, table_name))
+            c = conn.execute("SELECT COUNT(*) FROM "+table_name+" WHERE "+key+" IS NULL")
+            self.logger.info('%d rows of %s without %s kept' %(c.fetchone()[0], table_name, key))
+            conn.execute("CREATE UNIQUE INDEX "+index_name+" ON "+table_name+" ("+key+")")
+
+    def insert_chunks(self, conn, table_name, chunks, upsert_key=None):
+        """
+        *method: insert_chunks
+        *description: method to insert chunks of rows into database table in a single transaction
+        *return: number of rows inserted
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     upsert on upsert_key
+        *
+        *Parameters
+        *   conn:
+        *   table_name:
+        *   chunks: iterable of lists of rows, an exception raised by it rolls back the whole load
+        *   upsert_key: column with a unique index, a row with a known key updates the existing row
+        """
+        rows = 0
+        sql = None
+        #the connection context manager commits once at the end or rolls back on error
+        with conn:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if sql is None:
+                    sql = "INSERT INTO "+table_name+" values ({values})".format(values = ','.join(['?']*len(chunk[0])))
+                    if upsert_key is not None:
+                        columns = [row[1] for row in conn.execute("PRAGMA table_info("+table_name+")")]
+                        sql += " ON CONFLICT ("+upsert_key+") DO UPDATE SET "+', '.join(col+' = excluded.'+col for col in columns if col != upsert_key)
+                conn.executemany(sql, chunk)
+                rows += len(chunk)
+        return rows
+
+    def export_csv(self, database_name, table_name, chunk_size=10000):
         """
         *method: export_csv
         *description: method to export select data from table in export into csv
@@ -151,36 +267,75 @@ class DatabaseOperation:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     stream the rows with fetchmany through a buffered file
+        *D. Rawlins    18-OCT-2026       1.2     connection given back to the pool on error
         *
         *Parameters
         *   database_name:
+        *   table_name:
+        *   chunk_size: number of rows fetched at once
         """
         
         self.file_from_db = self.data_path+str('_validation/')
         self.file_name = 'InputFile.csv'
         
+        conn = None
         try:
             self.logger.info('Start of Exporting Data into CSV...')
             conn = self.database_connection(database_name)
             sqlSelect = "SELECT * FROM "+table_name+""
             cursor = conn.cursor()
             cursor.execute(sqlSelect)
-            results = cursor.fetchall()
             #Get the headers of the CSV
             headers = [i[0] for i in cursor.description]
             #Make the CSV output directory
             if not os.path.isdir(self.file_from_db):
                 os.makedirs(self.file_from_db)
             #Open CSV file for writing
-            csv_file = csv.writer(open(self.file_from_db + self.file_name, 'w', newline=''), delimiter=',', lineterminator='\r\n', quoting=csv.QUOTE_ALL, escapechar='\\')
-            
-            #Add the headers and data to the CSV file.
-            csv_file.writerow(headers)
-            csv_file.writerows(results)
-            self.logger.info('End of Exporting Data into CSV...')
+            rows = 0
+            with open(self.file_from_db + self.file_name, 'w', newline='', buffering=1<<20) as f:
+                csv_file = csv.writer(f, delimiter=',', lineterminator='\r\n', quoting=csv.QUOTE_MINIMAL, escapechar='\\')
+                #Add the headers and data to the CSV file.
+                csv_file.writerow(headers)
+                for results in iter(lambda: cursor.fetchmany(chunk_size), []):
+                    csv_file.writerows(results)
+                    rows += len(results)
+            self.logger.info('End of Exporting Data into CSV: %d rows' %rows)
             
             
         except Exception as e:
             self.logger.exception('Exception raised while Exporting Data into CSV: %s' %e)
-        
-        
\ No newline at end of file
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def read_table(self, database_name, table_name):
+        """
+        *method: read_table
+        *description: method to read a table straight into a DataFrame without the csv round trip,
+        *             the typed columns and their NULLs give the same dtypes as read_csv of the export
+        *return: A pandas DataFrame
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     no type inference on the typed columns
+        *D. Rawlins    18-OCT-2026       1.2     connection given back to the pool on error
+        *
+        *Parameters
+        *   database_name:
+        *   table_name:
+        """
+        conn = None
+        try:
+            self.logger.info('Start of Reading Table...')
+            conn = self.database_connection(database_name)
+            data = pd.read_sql_query("SELECT * FROM "+table_name, conn)
+            self.logger.info('End of Reading Table: %d rows' %len(data))
+            return data
+        except Exception as e:
+            self.logger.exception('Exception raised while Reading Table: %s' %e)
+            raise e
+        finally:
+            if conn is not None:
+                conn.close()
@@ -1,9 +1,11 @@
 import json
+import hashlib
 from os import listdir
 import shutil
 import pandas as pd
 from datetime import datetime
 import os
+import time
 from apps.database.database_operation import DatabaseOperation
 from apps.core.logger import Logger
 
@@ -21,17 +23,30 @@ class LoadValidate:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     single-pass streaming validation into the database
+    *D. Rawlins    18-OCT-2026       1.2     columnar snapshot of the validated training set
+    *D. Rawlins    18-OCT-2026       1.3     incremental training load with a file manifest
+    *D. Rawlins    18-OCT-2026       1.4     values stored with the schema types
+    *D. Rawlins    18-OCT-2026       1.5     validation of api prediction records
+    *D. Rawlins    18-OCT-2026       1.6     file validation rules only in stream_validate_file
+    *D. Rawlins    18-OCT-2026       1.7     pooled connection released on errors
     *
     *
     *description: Class to load, validate and transform the data
     *
     **************************************************************************
     """
-    def __init__(self, run_id, data_path, mode):
+    def __init__(self, run_id, data_path, mode, chunk_size=10000):
         self.run_id = run_id
         self.data_path = data_path
+        self.chunk_size = chunk_size
         self.logger = Logger(self.run_id,'LoadValidate', mode)
         self.dbOperation = DatabaseOperation(self.run_id, self.data_path, mode)
+        # feather snapshot of InputFile.csv and the content hash of the files it was built from
+        self.snapshot_file = self.data_path+'_validation/InputFile.feather'
+        self.snapshot_key_file = self.data_path+'_validation/InputFile.json'
+        # schema_predict.json columns, read once by validate_records
+        self.predict_schema = None
     
     def values_from_schema(self, schema_file):
         """
@@ -65,94 +80,204 @@ class LoadValidate:
             self.logger.exception('ValueError raised while Reading values From Schema: %s' %e)
             raise ellipsis
         return column_names, number_of_columns
-    def validate_column_length(self, number_of_columns):
+    def typed_rows(self, chunk, data_types):
         """
-        *method: validate_column_length
-        *description: method to validates the number of columns in the csv files
-        *return: none
+        *method: typed_rows
+        *description: method to convert a chunk of text values to the types of the schema columns, the
+        *             missing values become None so they are stored as SQL NULL
+        *return: list of rows
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
-        *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
         *
         *Parameters
-        *   number_of_columns:
+        *   chunk: pandas DataFrame of strings
+        *   data_types: schema type of every column, in the column order
         """
-        try:
-            self.logger.info('Start of Validating Column Length...')
-            for file in listdir(self.data_path):
-                csv = pd.read_csv(self.data_path+'/'+file)
-                if csv.shape[1] == number_of_columns:
-                    pass
-                else:
-                    shutil.move(self.data_path +'/'+file, self.data_path+'_rejects')
-                    self.logger.info("Invalud Columns Length :: %s" %file)
-            self.logger.info('End of Validating column Length')            
-        except OSError:
-            self.logger.exception('OSError raised while Validating Column Length')
-            raise OSError
-        except Exception as e:
-            self.logger.exception('Exception raised while Validating column Length: %s' %e)
-            raise e
-    
-    def validate_missing_values(self):
+        columns = []
+        for col, data_type in zip(chunk.columns, data_types):
+            values = self.typed_column(chunk[col], data_type, col)
+            columns.append(values.astype(object).where(values.notna(), None).tolist())
+        return list(zip(*columns))
+
+    def typed_column(self, values, data_type, col):
         """
-        *method: validate_missing_values
-        *description: method to validates if any columns in the csv file has all values missing.
-        *             If all the values are missing, the file is not suitable for processing. it ti be moved to bad files
-        *return: none
+        *method: typed_column
+        *description: method to convert the values of a column to its schema type, integers are nullable
+        *return: pandas Series
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
-        *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
         *
         *Parameters
-        *   none:
+        *   values: pandas Series
+        *   data_type: schema type
+        *   col: column name
         """
+        data_type = data_type.upper()
         try:
-            self.logger.info('Start of Validating Missing Values...')
-            for file in listdir(self.data_path):
-                csv = pd.read_csv(self.data_path+'/'+file)
-                count = 0
-                for columns in csv:
-                    if (len(csv[columns]) - csv[columns].count()) == len(csv[columns]):
-                        count+=1
-                        shutil.move(self.data_path+'/'+file, self.data_path+'_rejects')
-                        self.logger.info("All Missing Values in Column :: %s" %file)
-                        break
-            
-            self.logger.info('End of Validating Missing Values')            
-        except OSError:
-            self.logger.exception('OSError raised while Validating Missing values')
-            raise OSError
-        except Exception as e:
-            self.logger.exception('Exception raised while Validating Missing values: %s' %e)
-            raise e
-    def replace_missing_values(self):
+            if 'INT' in data_type:
+                return pd.to_numeric(values).astype('Int64')
+            if 'REAL' in data_type or 'FLOA' in data_type or 'DOUB' in data_type:
+                return pd.to_numeric(values).astype('float64')
+            return values.astype(object).where(values.notna(), None)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid %s Values in Column %s" %(data_type, col))
+
+    def validate_records(self, data):
+        """
+        *method: validate_records
+        *description: method to validate prediction records received by the api against schema_predict.json.
+        *             Every schema column but empid is required, unknown columns are rejected and the values
+        *             are converted to the schema types. Missing values are left for the imputer.
+        *return: A pandas DataFrame in the schema column order
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data: pandas DataFrame
+        """
+        if self.predict_schema is None:
+            self.predict_schema, number_of_columns = self.values_from_schema('schema_predict')
+        unknown = [col for col in data.columns if col not in self.predict_schema]
+        if unknown:
+            raise ValueError("Unknown Columns :: %s" %unknown)
+        missing = [col for col in self.predict_schema if col != 'empid' and col not in data.columns]
+        if missing:
+            raise ValueError("Missing Columns :: %s" %missing)
+        columns = {}
+        for col, data_type in self.predict_schema.items():
+            if col not in data.columns:
+                #empid is only an identifier, the rows are numbered when it is not sent
+                columns[col] = pd.Series(range(len(data)), index=data.index)
+                continue
+            values = self.typed_column(data[col], data_type, col)
+            if str(values.dtype) == 'Int64':
+                values = values.astype('float64') if values.isna().any() else values.astype('int64')
+            columns[col] = values
+        return pd.DataFrame(columns, index=data.index)
+
+    def stream_validate_file(self, file, number_of_columns, data_types=None):
+        """
+        *method: stream_validate_file
+        *description: method to read a csv file once in chunks, validating the column length and the
+        *             columns with all values missing while converting the values to the schema types.
+        *             The file is only known to be valid after the last chunk, so the caller has to
+        *             roll back the rows already consumed when a ValueError is raised.
+        *return: generator of lists of validated rows
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     typed values and None for missing instead of "NULL"
+        *
+        *Parameters
+        *   file:
+        *   number_of_columns:
+        *   data_types: schema type of every column, text when not given
+        """
+        non_null = None
+        with pd.read_csv(self.data_path+'/'+file, chunksize=self.chunk_size, dtype=str) as reader:
+            for chunk in reader:
+                if chunk.shape[1] != number_of_columns:
+                    raise ValueError("Invalud Columns Length :: %s" %file)
+                present = chunk.notna().any()
+                non_null = present if non_null is None else (non_null | present)
+                yield self.typed_rows(chunk, data_types or ['VARCHAR']*number_of_columns)
+        if non_null is None or not non_null.all():
+            raise ValueError("All Missing Values in Column :: %s" %file)
+
+    def file_hash(self, file):
+        """
+        *method: file_hash
+        *description: method to hash the content of a file
+        *return: sha256 hex digest
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   file:
+        """
+        digest = hashlib.sha256()
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1<<20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def validate_insert_data(self, number_of_columns, database_name, table_name, upsert_key=None, column_names=None):
         """
-        *method: replace_missing_values
-        *description: method to replaces the  missing values in columns with "NULL".
+        *method: validate_insert_data
+        *description: method to validate every csv file in a single pass and insert the valid rows into
+        *             the database table. Invalid files are rolled back and moved to the rejects folder.
+        *             With an upsert_key the load is incremental: files found in the manifest are skipped
+        *             and rows update the existing row of their key instead of being appended again.
         *return: none
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
-        *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     manifest and upsert_key
+        *D. Rawlins    18-OCT-2026       1.2     values typed with the schema column types
+        *D. Rawlins    18-OCT-2026       1.3     connection released on errors
         *
         *Parameters
-        *   none:
+        *   number_of_columns:
+        *   database_name:
+        *   table_name:
+        *   upsert_key:
+        *   column_names: schema columns and types
         """
+        conn = None
         try:
-            self.logger.info('Start of Replacing Missing Values with NULL...')
-            only_files = [f for f in listdir(self.data_path)]
-            for file in only_files:
-                csv = pd.read_csv(self.data_path+"/"+file)
-                csv.fillna('NULL', inplace=True)
-                csv.to_csv(self.data_path+"/"+file, index=None, header=True)
-                self.logger.info('%s: File Transformed successfully!!'%file)
-            self.logger.info('End of Replacing Missing Values with NULL...')
-            
+            self.logger.info('Start of Validating and Inserting Data...')
+            data_types = list(column_names.values()) if column_names else None
+            conn = self.dbOperation.database_connection(database_name)
+            self.dbOperation.clear_null_strings(conn, table_name)
+            if upsert_key is not None:
+                self.dbOperation.create_manifest(conn)
+                self.dbOperation.create_unique_key(conn, table_name, upsert_key)
+            for file in listdir(self.data_path):
+                try:
+                    if upsert_key is not None:
+                        stat = os.stat(self.data_path+'/'+file)
+                        if self.dbOperation.manifest_match(conn, file, stat.st_size, stat.st_mtime_ns):
+                            self.logger.info('%s: already loaded, skipped' %file)
+                            continue
+                        file_hash = self.file_hash(self.data_path+'/'+file)
+                        if self.dbOperation.manifest_match(conn, file, stat.st_size, stat.st_mtime_ns, file_hash):
+                            self.dbOperation.manifest_record(conn, file, stat.st_size, stat.st_mtime_ns, file_hash, 0)
+                            self.logger.info('%s: same content already loaded, skipped' %file)
+                            continue
+                    start = time.perf_counter()
+                    rows = self.dbOperation.insert_chunks(conn, table_name, self.stream_validate_file(file, number_of_columns, data_types), upsert_key)
+                    elapsed = time.perf_counter() - start
+                    #recorded after the commit of the rows, a file loaded again after a crash only updates its rows
+                    if upsert_key is not None:
+                        self.dbOperation.manifest_record(conn, file, stat.st_size, stat.st_mtime_ns, file_hash, rows)
+                    self.logger.info('%s: %d rows validated and inserted in %.2fs (%.0f rows/s)' %(file, rows, elapsed, rows/elapsed if elapsed > 0 else rows))
+                except ValueError as e:
+                    shutil.move(self.data_path+'/'+file, self.data_path+'_rejects')
+                    self.logger.info(str(e))
+                except Exception as e:
+                    shutil.move(self.data_path+'/'+file, self.data_path+'_rejects')
+                    self.logger.exception('Exception raised while Inserting Data into Table: %s'%e)
+            self.logger.info('End of Validating and Inserting Data...')
+        except OSError:
+            self.logger.exception('OSError raised while Validating and Inserting Data')
+            raise OSError
         except Exception as e:
-            self.logger.exception('Exception raised while Replacing Missing values with NULL: %s' %e)
+            self.logger.exception('Exception raised while Validating and Inserting Data: %s' %e)
+            raise e
+        finally:
+            if conn is not None:
+                conn.close()
+
     def archive_old_files(self):
         """
         *method: archive_old_files
@@ -242,6 +367,7 @@ class LoadValidate:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     replace a processed file delivered again
         *
         *Parameters
         *   none:
@@ -249,6 +375,9 @@ class LoadValidate:
         try:
             self.logger.info('Start of Moving Processed Files...')
             for file in listdir(self.data_path):
+                #a file delivered again replaces its processed copy
+                if os.path.isfile(self.data_path+'_processed/'+file):
+                    os.remove(self.data_path+'_processed/'+file)
                 shutil.move(self.data_path+'/'+file, self.data_path+'_processed')
                 self.logger.info("Moved the already processed file %s"%file)
             self.logger.info('End of Moving Processed Files...')
@@ -256,6 +385,94 @@ class LoadValidate:
             self.logger.exception('Exception raised while Moving Processed File %s'%e)
             raise e
     
+    def snapshot_key(self, schema_file):
+        """
+        *method: snapshot_key
+        *description: method to hash the schema and the content of the files waiting to be loaded
+        *return: sha256 hex digest, None when there are no files to load
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   schema_file:
+        """
+        files = sorted(listdir(self.data_path)) if os.path.isdir(self.data_path) else []
+        if not files:
+            return None
+        digest = hashlib.sha256()
+        for file in ['apps/database/'+schema_file+'.json']+[self.data_path+'/'+f for f in files]:
+            digest.update((os.path.basename(file)+self.file_hash(file)).encode())
+        return digest.hexdigest()
+
+    def snapshot_is_current(self, key):
+        """
+        *method: snapshot_is_current
+        *description: method to check if the snapshot holds the data to load. With no new files the
+        *             data did not change, with the same files as the last load they were already loaded.
+        *return: True if the snapshot can be used instead of loading the files
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   key:
+        """
+        if not os.path.isfile(self.snapshot_file) or not os.path.isfile(self.snapshot_key_file):
+            return False
+        if key is None:
+            return True
+        with open(self.snapshot_key_file, 'r') as f:
+            return json.load(f)['key'] == key
+
+    def write_snapshot(self, key, database_name, table_name):
+        """
+        *method: write_snapshot
+        *description: method to write the training table as an uncompressed feather file, read back memory
+        *             mapped by the preprocessor. Without pyarrow the csv stays the only copy.
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     read the table directly instead of InputFile.csv
+        *
+        *Parameters
+        *   key:
+        *   database_name:
+        *   table_name:
+        """
+        try:
+            self.logger.info('Start of Writing snapshot...')
+            from pyarrow import feather
+            data = self.dbOperation.read_table(database_name, table_name)
+            feather.write_feather(data, self.snapshot_file+'.tmp', compression='uncompressed')
+            os.replace(self.snapshot_file+'.tmp', self.snapshot_file)
+            with open(self.snapshot_key_file, 'w') as f:
+                f.write(json.dumps({'key': key, 'rows': len(data)}))
+            self.logger.info('End of Writing snapshot: %d rows' %len(data))
+        except Exception as e:
+            self.logger.exception('Snapshot not written, the csv will be read: %s' %e)
+
+    def remove_snapshot(self):
+        """
+        *method: remove_snapshot
+        *description: method to remove the snapshot before the data it was built from changes
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        for file in [self.snapshot_key_file, self.snapshot_file]:
+            if os.path.isfile(file):
+                os.remove(file)
+
     def validate_trainset(self):
         """
         *method: validate_trainset
@@ -265,28 +482,37 @@ class LoadValidate:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     single-pass validation and insert
+        *D. Rawlins    18-OCT-2026       1.2     skip the load when the snapshot is current
+        *D. Rawlins    18-OCT-2026       1.3     incremental load, upserts on empid
+        *D. Rawlins    18-OCT-2026       1.4     typed columns with SQL NULL
         *
         *Parameters
         *   none:
         """
         try:
             self.logger.info('Start of Data Load, validation and transformation...')
+            key = self.snapshot_key('schema_train')
+            if self.snapshot_is_current(key):
+                self.logger.info('Training data unchanged, using snapshot '+self.snapshot_file)
+                if key is not None:
+                    self.move_processed_files()
+                self.logger.info('End of Data Load, validation and transformation')
+                return
             #archive old files
             self.archive_old_files()
+            self.remove_snapshot()
             #extracting values from training schema
             column_names, number_of_columns = self.values_from_schema('schema_train')
-            #validating column length in the file
-            self.validate_column_length(number_of_columns)
-            #validating if any column has all values missing
-            self.validate_missing_values()
-            #replacing blanks in the csv file with "NULL" values
-            self.replace_missing_values()
             #create database with given name, if present open the connection! Create table with columns given in schema
             self.dbOperation.create_table('training','training_raw_data_t', column_names)
-            #insert csv files in the table
-            self.dbOperation.insert_data('training','training_raw_data_t')
+            #validate column length and missing values, convert to the schema types and insert in the table in one pass
+            #only the files missing in the manifest are loaded, upserted on empid
+            self.validate_insert_data(number_of_columns, 'training', 'training_raw_data_t', upsert_key='empid', column_names=column_names)
             #export data in table to csv file
             self.dbOperation.export_csv('training','training_raw_data_t')
+            #columnar copy of the csv for the preprocessor and the next runs
+            self.write_snapshot(key, 'training', 'training_raw_data_t')
             #move processed files
             self.move_processed_files()
             self.logger.info('End of Data Load, validation and transformation')
@@ -303,6 +529,8 @@ class LoadValidate:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     single-pass validation and insert
+        *D. Rawlins    18-OCT-2026       1.2     typed columns with SQL NULL
         *
         *Parameters
         *   none:
@@ -313,16 +541,10 @@ class LoadValidate:
             self.archive_old_files()
             #extracting values from training schema
             column_names, number_of_columns = self.values_from_schema('schema_predict')
-            #validating column length in the file
-            self.validate_column_length(number_of_columns)
-            #validating if any column has all values missing
-            self.validate_missing_values()
-            #replacing blanks in the csv file with "NULL" values
-            self.replace_missing_values()
             #create database with given name, if present open the connection! Create table with columns given in schema
             self.dbOperation.create_table('prediction','prediction_raw_data_t', column_names)
-            #insert csv files in the table
-            self.dbOperation.insert_data('prediction','prediction_raw_data_t')
+            #validate column length and missing values, convert to the schema types and insert in the table in one pass
+            self.validate_insert_data(number_of_columns, 'prediction', 'prediction_raw_data_t', column_names=column_names)
             #export data in table to csv file
             self.dbOperation.export_csv('prediction','prediction_raw_data_t')
             #move processed files
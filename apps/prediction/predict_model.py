@@ -1,8 +1,11 @@
+import numpy as np
 import pandas as pd
 from apps.core.logger import Logger
 from apps.ingestion.load_validate import LoadValidate
 from apps.preprocess.preprocessor import Preprocessor
 from apps.core.file_operation import FileOperation
+from apps.core.model_registry import ModelRegistry
+from apps.prediction.result_sink import ResultSink
 
 class PredictModel:
     """_summary_
@@ -18,29 +21,104 @@ class PredictModel:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    19-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     models served from the in-memory ModelRegistry
+    *D. Rawlins    18-OCT-2026       1.2     batch prediction streamed in chunks
+    *D. Rawlins    18-OCT-2026       1.3     results written through a ResultSink in input order
+    *D. Rawlins    18-OCT-2026       1.4     rows routed to the cluster models in one sorted pass
+    *D. Rawlins    18-OCT-2026       1.5     batch prediction returns its result file
+    *D. Rawlins    18-OCT-2026       1.6     one ModelSet snapshot per request and per batch job
     *
     *
     *description: Class to prediction the result
     *
     **************************************************************************
     """
-    def __init__(self, run_id, data_path):
+    def __init__(self, run_id, data_path, chunk_size=50000, result_format='csv'):
         self.run_id = run_id
         self.data_path = data_path
+        # rows read, preprocessed and predicted at a time by batch prediction
+        self.chunk_size = chunk_size
+        # batch prediction results: 'csv', 'parquet' or 'sqlite'
+        self.result_format = result_format
         self.logger = Logger(self.run_id, 'PredictModel','prediction')
         self.loadValidate = LoadValidate(self.run_id, self.data_path,'prediction')
         self.preProcess = Preprocessor(self.run_id, self.data_path,'prediction')
         self.fileOperation = FileOperation(self.run_id, self.data_path,'prediction')
+        self.modelRegistry = ModelRegistry(self.run_id, self.data_path,'prediction')
     
+    def route_predict(self, features, modelSet):
+        """
+        *method: route_predict
+        *description: method to predict every row with the model of its cluster. The rows are sorted by
+        *             cluster once, every cluster model predicts one contiguous block and the predictions
+        *             are scattered back into one output array in the original row order.
+        *return: numpy array of predictions
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     models of one ModelSet
+        *
+        *Parameters
+        *   features: pandas DataFrame in the training column layout
+        *   modelSet: ModelSet the rows are predicted with
+        """
+        if len(features) == 0:
+            return np.empty(0, dtype=np.int64)
+        #load model
+        kmeans = modelSet.kmeans
+        #cluster selection
+        clusters = kmeans.predict(features)
+        order = np.argsort(clusters, kind='stable')
+        sorted_clusters = clusters[order]
+        values = features.to_numpy()[order]
+        bounds = np.flatnonzero(np.diff(sorted_clusters)) + 1
+        y_predicted = None
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(order)]):
+            model = modelSet.get_cluster_model(sorted_clusters[start])
+            #a view of the block with the training column names
+            block = pd.DataFrame(values[start:end], columns=features.columns, copy=False)
+            cluster_predicted = model.predict(block)
+            if y_predicted is None:
+                y_predicted = np.empty(len(order), dtype=cluster_predicted.dtype)
+            y_predicted[order[start:end]] = cluster_predicted
+        return y_predicted
+
+    def predict_chunk(self, data, modelSet):
+        """
+        *method: predict_chunk
+        *description: method to predict a preprocessed chunk, every row is routed to the model of its cluster
+        *             and its prediction is scattered back to its position, so the result keeps the input order
+        *return: A pandas DataFrame with EmpId and Prediction
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     predictions kept in input order
+        *D. Rawlins    18-OCT-2026       1.2     routed by route_predict
+        *D. Rawlins    18-OCT-2026       1.3     models of one ModelSet
+        *
+        *Parameters
+        *   data:
+        *   modelSet: ModelSet the rows are predicted with
+        """
+        y_predicted = self.route_predict(data.drop(['empid'], axis=1), modelSet)
+        return pd.DataFrame({"EmpId":data['empid'].to_numpy(),"Prediction":y_predicted})
+
     def batch_predict_from_model(self):
         """
         *method: batch_predict_from_model
         *description: method to predict the results
-        *return: none
+        *return: result file name
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    19-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     load models from ModelRegistry
+        *D. Rawlins    18-OCT-2026       1.2     read, preprocess, predict and append chunk by chunk
+        *D. Rawlins    18-OCT-2026       1.3     write through a ResultSink opened once
+        *D. Rawlins    18-OCT-2026       1.4     return the result file name
+        *D. Rawlins    18-OCT-2026       1.5     every chunk predicted with the same ModelSet
         *
         *Parameters
         *   none:
@@ -50,31 +128,43 @@ class PredictModel:
             self.logger.info('run_id:'+ str(self.run_id) )
             #validations and transformation
             self.loadValidate.validate_predictset()
-            #preprocessing activities
-            self.X = self.preProcess.preprocess_predictset()
-            #load model
-            kmeans = self.fileOperation.load_model('KMeans')
-            #cluster selection
-            clusters = kmeans.predict(self.X.drop(['empid'],axis=1))
-            self.X['clusters'] = clusters
-            clusters = self.X['clusters'].unique()
-            y_predicted = []
-            for i in clusters:
-                self.logger.info('clusters loop started')
-                cluster_data = self.X[self.X['clusters']==i]
-                cluster_data_new = cluster_data.drop(['empid','clusters'], axis=1)
-                model_name = self.fileOperation.correct_model(i)
-                model = self.fileOperation.load_model(model_name)
-                y_predicted = model.predict(cluster_data_new)
-                
-                result = pd.DataFrame({"EmpId":cluster_data['empid'],"Prediction":y_predicted})
-                result.to_csv(self.data_path+'_results/'+'Predictions.csv', header=True, mode='a+', index=False)
+            #the whole job uses the models loaded now, a version published during the job is not mixed in
+            modelSet = self.modelRegistry.snapshot()
+            self.logger.info('Models version: '+str(modelSet.version))
+            #preprocessing activities and prediction, only one chunk is in memory at a time
+            resultSink = ResultSink(self.run_id, self.data_path, 'prediction', self.result_format)
+            resultSink.open()
+            try:
+                for X in self.preProcess.preprocess_predict_chunks(self.chunk_size, modelSet):
+                    resultSink.write(self.predict_chunk(X, modelSet))
+                    self.logger.info('Rows predicted: '+str(resultSink.rows))
+            finally:
+                resultSink.close()
             self.logger.info('End of Prediction')
+            return resultSink.file_name
         except Exception:
             self.logger.exception('Unsuccessful End of Prediction')
             raise Exception
     
-    def single_predict_from_model(self,data):
+    def predict_rows(self, data):
+        """
+        *method: predict_rows
+        *description: method to preprocess and predict the rows of one or more requests at once
+        *return: numpy array of predictions, in the row order of data
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     preprocessed and predicted with one ModelSet
+        *
+        *Parameters
+        *   data:
+        """
+        modelSet = self.modelRegistry.snapshot()
+        X = self.preProcess.preprocess_predict(data, modelSet)
+        return self.route_predict(X.drop(['empid'], axis=1), modelSet)
+
+    def single_predict_from_model(self, data):
         """
         *method: single_predict_from_model
         *description: method to predict single results
@@ -84,6 +174,10 @@ class PredictModel:
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    19-JAN-2024       1.0     initial creation
         *D. Rawlins    19-JAN-2024      1.0.1    editing return function
+        *D. Rawlins    18-OCT-2026      1.0.2    load models from ModelRegistry
+        *D. Rawlins    18-OCT-2026      1.0.3    column layout from the compiled FeatureLayout
+        *D. Rawlins    18-OCT-2026      1.0.4    routed by route_predict
+        *D. Rawlins    18-OCT-2026      1.0.5    shares predict_rows with the batcher
         *
         *Parameters
         *   data:
@@ -93,28 +187,11 @@ class PredictModel:
             self.logger.info('run_id:'+ str(self.run_id) )
             
             #preprocessing activities
-            self.X = self.preProcess.preprocess_predict(data)
-            #load model
-            kmeans = self.fileOperation.load_model('KMeans')
-            #cluster selection
-            clusters = kmeans.predict(self.X.drop(['empid'], axis=1))
-            self.X['clusters'] = clusters
-            y_predicted = []
-            for i in clusters:
-                self.logger.info('clusters loop started')
-                cluster_data = self.X[self.X['clusters']==i]
-                cluster_data_new = cluster_data.drop(['empid','clusters'], axis=1)
-                model_name = self.fileOperation.correct_model(i)
-                model = self.fileOperation.load_model(model_name)
-                self.logger.info('Shape of Data '+str(cluster_data_new.shape))
-                self.logger.info('Info of Data '+str(cluster_data_new.info()))
-                y_predicted = model.predict(cluster_data_new)
-                                               
-                #result = pd.DataFrame({"EmpId":cluster_data['empid'],"Prediction":y_predicted})
-                #result.to_csv(self.data_path+'_results/'+'Predictions.csv', header=True, mode='a+', index=False)
-                self.logger.info('Output : '+str(y_predicted))
-                return int(y_predicted[0])
+            self.logger.info('Shape of Data '+str(data.shape))
+            y_predicted = self.predict_rows(data)
+            self.logger.info('Output : '+str(y_predicted))
             self.logger.info('End of Prediction')
+            return int(y_predicted[0])
         except Exception:
             self.logger.exception('Unsuccessful End of Prediction')
             raise Exception
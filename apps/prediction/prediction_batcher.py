@@ -0,0 +1,159 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import pandas as pd
+from apps.core.logger import Logger
+
+
+class PredictionBatcher:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       prediction_batcher.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     worker thread started in the serving process, after fork
+    *
+    *
+    *description: Class to coalesce concurrent single predictions. Requests
+    *             wait at most max_wait_ms for others to arrive, up to
+    *             max_batch_size rows are scored in one vectorized call by a
+    *             single worker thread and every request gets its own rows back.
+    *
+    **************************************************************************
+    """
+    def __init__(self, run_id, predict, max_wait_ms=5, max_batch_size=64):
+        self.run_id = run_id
+        # callable scoring a DataFrame of requests, returns one prediction per row
+        self.predict = predict
+        self.max_wait = max_wait_ms/1000
+        self.max_batch_size = max_batch_size
+        self.logger = Logger(self.run_id, 'PredictionBatcher', 'prediction')
+        self.lock = threading.Lock()
+        self.requests = None
+        self.thread = None
+        self.pid = None
+
+    def start(self):
+        """
+        *method: start
+        *description: method to start the worker thread of this process. Threads do not survive fork,
+        *             a pre-forked server worker starts its own on its first request.
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.requests = queue.Queue()
+            self.thread = threading.Thread(target=self.run, args=(self.requests,), name='PredictionBatcher', daemon=True)
+            self.thread.start()
+            self.pid = os.getpid()
+
+    def submit(self, data):
+        """
+        *method: submit
+        *description: method to queue the rows of a request and wait for their predictions
+        *return: predictions of the rows
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data: pandas DataFrame
+        """
+        if self.pid != os.getpid():
+            self.start()
+        future = Future()
+        self.requests.put((data, future))
+        return future.result()
+
+    def collect(self, requests):
+        """
+        *method: collect
+        *description: method to wait for a request and gather the ones arriving within max_wait
+        *return: list of (data, future)
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   requests: queue of the worker thread
+        """
+        batch = [requests.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+            rows += len(batch[-1][0])
+        return batch
+
+    def score(self, batch):
+        """
+        *method: score
+        *description: method to score a batch and hand every request its slice of the predictions. When
+        *             the batch fails the requests are scored one by one, so a bad request only fails itself.
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   batch: list of (data, future)
+        """
+        try:
+            data = batch[0][0] if len(batch) == 1 else pd.concat([d for d, f in batch], ignore_index=True)
+            y_predicted = self.predict(data)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            self.logger.exception('Batch of %d requests failed, scoring them one by one: %s' %(len(batch), e))
+            for item in batch:
+                self.score([item])
+            return
+        start = 0
+        for d, future in batch:
+            future.set_result(y_predicted[start:start+len(d)])
+            start += len(d)
+        self.logger.info('Batch of %d requests scored' %len(batch))
+
+    def run(self, requests):
+        """
+        *method: run
+        *description: method of the worker thread, scores the batches as they are collected
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   requests: queue of the worker thread
+        """
+        while True:
+            self.score(self.collect(requests))
@@ -0,0 +1,168 @@
+import threading
+from apps.core.config import Config
+from apps.core.logger import Logger
+from apps.prediction.predict_model import PredictModel
+from apps.prediction.prediction_batcher import PredictionBatcher
+
+
+class PredictionService:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       prediction_service.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     optional micro-batching of single predictions
+    *D. Rawlins    18-OCT-2026       1.2     batch scoring of api records
+    *D. Rawlins    18-OCT-2026       1.3     preload and readiness for the pre-forking server
+    *D. Rawlins    18-OCT-2026       1.4     ready only with a complete set of models
+    *D. Rawlins    18-OCT-2026       1.5     batch records validated apart from the scoring
+    *D. Rawlins    18-OCT-2026       1.6     feature layout loaded with the models
+    *
+    *
+    *description: Class to keep one prediction pipeline alive for the whole
+    *             Flask process. It is built once at startup and holds the
+    *             column layout, the models and one logger, so a request only
+    *             pays for parsing, preprocessing and inference.
+    *
+    **************************************************************************
+    """
+    def __init__(self, batch_window_ms=None, max_batch_size=None):
+        self.config = Config()
+        self.run_id = self.config.get_run_id()
+        self.data_path = self.config.prediction_data_path
+        self.logger = Logger(self.run_id, 'PredictionService', 'prediction')
+        self.predictModel = PredictModel(self.run_id, self.data_path)
+        # the pipeline objects keep per-call state on self, calls are serialized
+        self.lock = threading.Lock()
+        if batch_window_ms is None:
+            batch_window_ms = self.config.prediction_batch_window_ms
+        if max_batch_size is None:
+            max_batch_size = self.config.prediction_max_batch_size
+        # with a batch window the concurrent single predictions are scored together
+        self.batcher = None
+        if batch_window_ms > 0:
+            self.batcher = PredictionBatcher(self.run_id, self.predict_rows, batch_window_ms, max_batch_size)
+        try:
+            self.load()
+        except Exception as e:
+            self.logger.exception('Models not loaded at startup, they will be loaded on first request: %s' %e)
+
+    def load(self):
+        """
+        *method: load
+        *description: method to load the models with the compiled feature layout of their version
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     the layout is loaded by the registry
+        *
+        *Parameters
+        *   none:
+        """
+        #only reloads when training published a new version
+        self.predictModel.modelRegistry.refresh()
+
+    def preload(self):
+        """
+        *method: preload
+        *description: method to load the layout and every model, called before the server forks
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        try:
+            self.load()
+            clusters = self.predictModel.modelRegistry.preload()
+            self.logger.info('Models preloaded for clusters: '+str(clusters))
+        except Exception as e:
+            self.logger.exception('Models not preloaded, they will be loaded on first request: %s' %e)
+
+    def ready(self):
+        """
+        *method: ready
+        *description: method to check if predictions can be served, the layout and a complete set of
+        *             models (KMeans and a model for every cluster) are loaded
+        *return: True if ready
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     check the set of models is complete
+        *
+        *Parameters
+        *   none:
+        """
+        try:
+            self.load()
+        except Exception:
+            return False
+        return self.predictModel.modelRegistry.complete()
+
+    def single_predict(self, data):
+        """
+        *method: single_predict
+        *description: method to predict single results with the shared pipeline
+        *return: y_predicted
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     through the batcher when enabled
+        *
+        *Parameters
+        *   data:
+        """
+        if self.batcher is not None:
+            return int(self.batcher.submit(data)[0])
+        with self.lock:
+            self.load()
+            return self.predictModel.single_predict_from_model(data)
+
+    def predict_rows(self, data):
+        """
+        *method: predict_rows
+        *description: method to predict the rows of several requests with the shared pipeline
+        *return: numpy array of predictions
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data:
+        """
+        with self.lock:
+            self.load()
+            return self.predictModel.predict_rows(data)
+
+    def validate_records(self, data):
+        """
+        *method: validate_records
+        *description: method to validate records against the prediction schema, the records are then
+        *             scored by predict_rows
+        *return: validated DataFrame
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     only validates, replaces batch_predict
+        *
+        *Parameters
+        *   data: pandas DataFrame of records
+        """
+        return self.predictModel.loadValidate.validate_records(data)
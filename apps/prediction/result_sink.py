@@ -0,0 +1,128 @@
+import os
+import sqlite3
+from apps.core.logger import Logger
+
+
+class ResultSink:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       result_sink.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *
+    *description: Class to write the batch prediction results. The target is
+    *             opened once per run and every chunk is appended to it:
+    *             csv through a large write buffer with a single header line,
+    *             parquet as one row group per chunk (pyarrow) or sqlite as one
+    *             Predictions table.
+    *
+    **************************************************************************
+    """
+    formats = {'csv': 'Predictions.csv', 'parquet': 'Predictions.parquet', 'sqlite': 'Predictions.db'}
+
+    def __init__(self, run_id, data_path, mode, result_format='csv', buffer_size=1<<20):
+        if result_format not in self.formats:
+            raise ValueError('result_format must be one of '+str(sorted(self.formats)))
+        self.run_id = run_id
+        self.data_path = data_path
+        self.result_format = result_format
+        self.buffer_size = buffer_size
+        self.folder_name = self.data_path+'_results/'
+        self.file_name = self.folder_name+self.formats[result_format]
+        self.logger = Logger(self.run_id, 'ResultSink', mode)
+        self.writer = None
+        self.rows = 0
+
+    def open(self):
+        """
+        *method: open
+        *description: method to open the result target, a previous result file is replaced
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        try:
+            if not os.path.isdir(self.folder_name):
+                os.makedirs(self.folder_name)
+            if self.result_format == 'csv':
+                self.writer = open(self.file_name, 'w', buffering=self.buffer_size, newline='')
+            elif self.result_format == 'sqlite':
+                self.writer = sqlite3.connect(self.file_name)
+                self.writer.execute('DROP TABLE IF EXISTS Predictions')
+                self.writer.execute('CREATE TABLE Predictions (EmpId INTEGER, Prediction INTEGER)')
+            else:
+                #the parquet writer needs the schema of the first chunk, it is created by write
+                if os.path.isfile(self.file_name):
+                    os.remove(self.file_name)
+            self.rows = 0
+            self.logger.info('Result sink opened: '+self.file_name)
+        except Exception as e:
+            self.logger.exception('Exception raised while opening result sink: %s' %e)
+            raise e
+
+    def write(self, result):
+        """
+        *method: write
+        *description: method to append a chunk of results
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   result: pandas DataFrame with EmpId and Prediction
+        """
+        try:
+            if self.result_format == 'csv':
+                result.to_csv(self.writer, header=self.rows == 0, index=False)
+            elif self.result_format == 'sqlite':
+                with self.writer:
+                    self.writer.executemany('INSERT INTO Predictions (EmpId, Prediction) VALUES (?, ?)',
+                                            zip(result['EmpId'].tolist(), result['Prediction'].tolist()))
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(result, preserve_index=False)
+                if self.writer is None:
+                    self.writer = pq.ParquetWriter(self.file_name, table.schema)
+                self.writer.write_table(table)
+            self.rows += len(result)
+        except Exception as e:
+            self.logger.exception('Exception raised while writing results: %s' %e)
+            raise e
+
+    def close(self):
+        """
+        *method: close
+        *description: method to flush and close the result target
+        *return: number of rows written
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        if self.writer is not None:
+            if self.result_format == 'csv' and self.rows == 0:
+                self.writer.write('EmpId,Prediction\n')
+            self.writer.close()
+            self.writer = None
+        self.logger.info('Result sink closed: '+str(self.rows)+' rows written to '+self.file_name)
+        return self.rows
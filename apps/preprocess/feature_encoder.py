@@ -0,0 +1,127 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from apps.core.logger import Logger
+
+
+class FeatureEncoder:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       feature_encoder.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     encoder file of the model version
+    *
+    *
+    *description: Class to dummy encode the categorical columns with the
+    *             categories learned at training time. The vocabulary is saved
+    *             next to columns.json, so prediction encodes a single row the
+    *             same way as the training set.
+    *
+    **************************************************************************
+    """
+    def __init__(self, run_id, data_path, mode, encoder_file='apps/database/encoder.json'):
+        self.run_id = run_id
+        self.data_path = data_path
+        # encoder.json of a model version, apps/database holds the one of models trained before versions
+        self.encoder_file = encoder_file
+        self.logger = Logger(self.run_id, 'FeatureEncoder', mode)
+        # sorted categories by categorical column, the first one is dropped like get_dummies(drop_first=True)
+        self.categories = None
+
+    def fit(self, data):
+        """
+        *method: fit
+        *description: method to learn the categories of every object column
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data:
+        """
+        self.categories = {}
+        for col in data.select_dtypes(include=['object']).columns:
+            self.categories[col] = sorted(data[col].dropna().unique().tolist())
+        self.logger.info('Categories learned: '+str(self.categories))
+
+    def encode(self, data):
+        """
+        *method: encode
+        *description: method to encode a dataframe, the categorical columns are replaced by their
+        *             dummy columns appended after the other columns
+        *return: A pandas DataFrame
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data:
+        """
+        columns = {col: data[col] for col in data.columns if col not in self.categories}
+        for col, categories in self.categories.items():
+            values = data[col].to_numpy()
+            for category in categories[1:]:
+                columns[col+'_'+str(category)] = (values == category).astype(np.uint8)
+        return pd.DataFrame(columns, index=data.index)
+
+    def save(self, encoder_file=None):
+        """
+        *method: save
+        *description: method to save the categories to encoder.json
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     saved to the given file
+        *
+        *Parameters
+        *   encoder_file: file saved to, encoder_file of the object when None
+        """
+        encoder_file = encoder_file or self.encoder_file
+        with open(encoder_file, 'w') as f:
+            f.write(json.dumps({'categories': self.categories}))
+        self.logger.info('Encoder saved to '+encoder_file)
+
+    def load(self, data_columns=None):
+        """
+        *method: load
+        *description: method to load the categories from encoder.json. Models trained before the
+        *             encoder was saved only have columns.json, the encoded categories are then taken
+        *             from the data_columns named <column>_<category>.
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data_columns:
+        """
+        if os.path.isfile(self.encoder_file):
+            with open(self.encoder_file, 'r') as f:
+                self.categories = json.load(f)['categories']
+        else:
+            #the categorical columns are the VARCHAR columns of the prediction schema, the dropped first
+            #category is not known but it is only needed to fit and it encodes as all 0
+            with open('apps/database/schema_predict.json', 'r') as f:
+                column_names = json.load(f)['ColName']
+            self.categories = {}
+            for col, data_type in column_names.items():
+                if data_type == 'VARCHAR':
+                    self.categories[col] = [None]+[c[len(col)+1:] for c in data_columns or [] if c.startswith(col+'_')]
+            self.logger.info('encoder.json not found, categories taken from data columns')
+        self.logger.info('Encoder loaded: '+str(self.categories))
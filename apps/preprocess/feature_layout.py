@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from apps.core.logger import Logger
+from apps.preprocess.feature_encoder import FeatureEncoder
+
+
+class FeatureLayout:
+    """_summary_
+    **************************************************************************
+    *
+    *filename:       feature_layout.py
+    *version:        1.0
+    *author:         Daniel Rawlins
+    *creation date:  18-Oct-2026
+    *
+    *change history:
+    *
+    *who           when           version    change(include bug# if apply)
+    *----------    -----------    -------    -----------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     columns and encoder files of the model version
+    *
+    *
+    *description: Class to compile the training column layout of columns.json
+    *             and the encoder categories into a plan of output indices, so
+    *             batch and single prediction data are written straight into a
+    *             preallocated array. Every model version has its own files, the
+    *             layout is compiled with the models of the version.
+    *
+    **************************************************************************
+    """
+    def __init__(self, run_id, data_path, mode, columns_file='apps/database/columns.json',
+                 encoder_file='apps/database/encoder.json'):
+        self.run_id = run_id
+        self.data_path = data_path
+        # files of a model version, apps/database holds the ones of models trained before versions
+        self.columns_file = columns_file
+        self.logger = Logger(self.run_id, 'FeatureLayout', mode)
+        self.featureEncoder = FeatureEncoder(self.run_id, self.data_path, mode, encoder_file)
+        self.lock = threading.Lock()
+        self.stamp = None
+        # (data_columns, numeric columns with their index, categorical columns with their categories and indices)
+        self.plan = None
+
+    def load(self):
+        """
+        *method: load
+        *description: method to load and compile the layout, only when columns.json changed
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        stamp = os.stat(self.columns_file).st_mtime_ns
+        if stamp == self.stamp:
+            return
+        with self.lock:
+            if stamp == self.stamp:
+                return
+            try:
+                with open(self.columns_file, 'r') as f:
+                    data_columns = json.load(f)['data_columns']
+                self.featureEncoder.load(data_columns)
+                self.plan = self.compile(data_columns, self.featureEncoder.categories)
+                self.stamp = stamp
+                self.logger.info('Feature layout compiled: '+str(data_columns))
+            except Exception as e:
+                self.logger.exception('Exception raised while compiling feature layout: %s' %e)
+                raise e
+
+    def compile(self, data_columns, categories):
+        """
+        *method: compile
+        *description: method to map every input column to its output indices
+        *return: the compiled plan
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data_columns:
+        *   categories:
+        """
+        index = {col: i for i, col in enumerate(data_columns)}
+        encoded = set()
+        categorical = []
+        for col, col_categories in categories.items():
+            pairs = [(category, index[col+'_'+str(category)]) for category in col_categories[1:] if col+'_'+str(category) in index]
+            encoded.update(col+'_'+str(category) for category, i in pairs)
+            if pairs:
+                categorical.append((col, np.array([c for c, i in pairs], dtype=object), np.array([i for c, i in pairs])))
+        numeric = [(col, i) for col, i in index.items() if col not in encoded]
+        return list(data_columns), numeric, categorical
+
+    def transform(self, data):
+        """
+        *method: transform
+        *description: method to write a dataframe into a preallocated array laid out as data_columns.
+        *             Encoded columns the data does not have stay 0, missing numeric values stay NaN
+        *             for the imputer.
+        *return: A pandas DataFrame over the array
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data:
+        """
+        self.load()
+        data_columns, numeric, categorical = self.plan
+        array = np.zeros((len(data), len(data_columns)))
+        for col, i in numeric:
+            if col in data.columns:
+                array[:, i] = pd.to_numeric(data[col], errors='coerce')
+        for col, col_categories, indices in categorical:
+            if col in data.columns:
+                array[:, indices] = data[col].to_numpy()[:, None] == col_categories[None, :]
+        return pd.DataFrame(array, columns=data_columns, copy=False)
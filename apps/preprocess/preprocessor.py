@@ -1,8 +1,9 @@
-import json
+import os
 import pandas as pd
 import numpy as np
-from sklearn.impute import KNNImputer
+from sklearn.impute import KNNImputer, SimpleImputer
 from apps.core.logger import Logger
+from apps.preprocess.feature_encoder import FeatureEncoder
 
 class Preprocessor:
     """_summary_
@@ -18,6 +19,14 @@ class Preprocessor:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     fitted FeatureEncoder, predict set encoded straight into the column layout
+    *D. Rawlins    18-OCT-2026       1.2     compiled FeatureLayout replaces final_predictset
+    *D. Rawlins    18-OCT-2026       1.3     imputer fitted at training time, only transform at prediction
+    *D. Rawlins    18-OCT-2026       1.4     chunked predict set
+    *D. Rawlins    18-OCT-2026       1.5     training set read from the feather snapshot
+    *D. Rawlins    18-OCT-2026       1.6     preprocess_predictset removed, replaced by preprocess_predict_chunks
+    *D. Rawlins    18-OCT-2026       1.7     prediction data imputed with the imputer of the request ModelSet
+    *D. Rawlins    18-OCT-2026       1.8     prediction data encoded with the FeatureLayout of the ModelSet
     *
     *
     *description: Class to pre-process training and predict dataset
@@ -25,10 +34,17 @@ class Preprocessor:
     **************************************************************************
     """
     
-    def __init__(self, run_id, data_path, mode):
+    def __init__(self, run_id, data_path, mode, imputer_strategy='knn', imputer_reference_size=5000):
         self.run_id = run_id
         self.data_path = data_path
         self.logger = Logger(self.run_id, 'Preprocessor', mode)
+        # 'knn' imputes from the nearest rows of a sampled reference set, 'median' from the column medians
+        self.imputer_strategy = imputer_strategy
+        # rows kept by the knn imputer as reference, bounds the cost of every transform
+        self.imputer_reference_size = imputer_reference_size
+        # imputer fitted by training, at prediction it comes with the ModelSet of the request
+        self.imputer = None
+        self.featureEncoder = FeatureEncoder(self.run_id, self.data_path, mode)
     
     def get_data(self):
         """
@@ -39,18 +55,71 @@ class Preprocessor:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     read the feather snapshot memory mapped when it is current
         *
         *Parameters
         *   none:
         """
         try:
             self.logger.info('Start of Reading dataset...')
-            self.data = pd.read_csv(self.data_path+'_validation/InputFile.csv')
+            self.data = self.read_snapshot()
+            if self.data is None:
+                self.data = pd.read_csv(self.data_path+'_validation/InputFile.csv')
             self.logger.info('End of reading dataset...')
             return self.data
         except Exception as e:
             self.logger.exception('Exception raised while reading dataset: %s'%e)
             raise e
+    def read_snapshot(self):
+        """
+        *method: read_snapshot
+        *description: method to read the feather snapshot written by validation, memory mapped
+        *return: A pandas DataFrame, None when there is no snapshot newer than InputFile.csv
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        snapshot_file = self.data_path+'_validation/InputFile.feather'
+        csv_file = self.data_path+'_validation/InputFile.csv'
+        if not os.path.isfile(snapshot_file):
+            return None
+        if os.path.isfile(csv_file) and os.path.getmtime(csv_file) > os.path.getmtime(snapshot_file):
+            return None
+        try:
+            from pyarrow import feather
+            data = feather.read_table(snapshot_file, memory_map=True).to_pandas()
+            self.logger.info('Dataset read from snapshot '+snapshot_file)
+            return data
+        except Exception as e:
+            self.logger.exception('Snapshot not read, reading csv: %s' %e)
+            return None
+
+    def get_data_chunks(self, chunk_size):
+        """
+        *method: get_data_chunks
+        *description: method to read datafile in chunks of chunk_size rows
+        *return: generator of pandas DataFrames
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   chunk_size:
+        """
+        try:
+            self.logger.info('Start of Reading dataset in chunks of %s rows...' %chunk_size)
+            for chunk in pd.read_csv(self.data_path+'_validation/InputFile.csv', chunksize=chunk_size):
+                yield chunk
+            self.logger.info('End of reading dataset...')
+        except Exception as e:
+            self.logger.exception('Exception raised while reading dataset: %s'%e)
+            raise e
+
     def drop_columns(self, data, columns):
         """
         *method: drop_columns
@@ -108,7 +177,39 @@ class Preprocessor:
             self.logger.exception('Exception raised while finding missing values:'+str(e))
             raise Exception()
     
-    def impute_missing_values(self, data):
+    def fit_imputer(self, data):
+        """
+        *method: fit_imputer
+        *description: method to fit the imputer on the training features. The knn imputer keeps a sample
+        *             of at most imputer_reference_size rows as reference.
+        *return: The fitted imputer
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data:
+        """
+        try:
+            self.logger.info('Start of fitting imputer...')
+            if self.imputer_strategy == 'median':
+                imputer = SimpleImputer(strategy='median', missing_values=np.nan)
+                imputer.fit(data)
+            else:
+                reference = data
+                if len(data) > self.imputer_reference_size:
+                    reference = data.sample(n=self.imputer_reference_size, random_state=0)
+                imputer = KNNImputer(n_neighbors=3, weights='uniform', missing_values=np.nan)
+                imputer.fit(reference)
+            self.imputer = imputer
+            self.logger.info('End of fitting imputer: %s' %self.imputer_strategy)
+            return self.imputer
+        except Exception as e:
+            self.logger.exception('Exception raised while fitting imputer:'+str(e))
+            raise Exception()
+
+    def impute_missing_values(self, data, imputer=None):
         """
         *method: impute_missing_values
         *description: method to impute missing values
@@ -117,15 +218,24 @@ class Preprocessor:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     transform with the fitted imputer
+        *D. Rawlins    18-OCT-2026       1.2     imputer passed by the caller at prediction
         *
         *Parameters
         *   data:
+        *   imputer: fitted imputer, the one fitted by this object when None
         """
         self.data = data
         try:
             self.logger.info('Start of Imputing missing values...')
-            imputer = KNNImputer(n_neighbors=3, weights='uniform', missing_values=np.nan)
-            self.new_array = imputer.fit_transform(self.data) #impute the missing values
+            if imputer is None:
+                imputer = self.imputer
+            if imputer is None:
+                #models trained before the imputer was saved
+                imputer = KNNImputer(n_neighbors=3, weights='uniform', missing_values=np.nan)
+                self.new_array = imputer.fit_transform(self.data) #impute the missing values
+            else:
+                self.new_array = imputer.transform(self.data) #impute the missing values
             #convert the nd-array returned in the step above to a Data frame
             self.new_data = pd.DataFrame(data=self.new_array, columns=self.data.columns)
             self.logger.info('End of Imputing missing values...')
@@ -138,21 +248,20 @@ class Preprocessor:
         """
         *method: feature_encoding
         *description: method to encode features
-        *return: none
+        *return: A pandas DataFrame with the categorical columns replaced by their dummy columns
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     single pass with the fitted FeatureEncoder, returns the whole encoded set
         *
         *Parameters
         *   data:
         """       
         try:
             self.logger.info('Start of feature encoding...')
-            self.new_data = data.select_dtypes(include=['object']).copy()
             #using the dummy encoding to encode the categorical columns to numerical ones
-            for col in self.new_data.columns:
-                self.new_data = pd.get_dummies(self.new_data, columns=[col], prefix=[col], drop_first=True)
+            self.new_data = self.featureEncoder.encode(data)
                 
             self.logger.info('End of feature encoding...')
             return self.new_data
@@ -186,41 +295,40 @@ class Preprocessor:
             self.logger.exception('Exception raised while splitting features and label:'+str(e))
             raise Exception()
                 
-    def final_predictset(self, data):
+    def encode_predictset(self, data, modelSet):
         """
-        *method: final_predictset
-        *description: method to build final predict set by adding additional encoded column with value as 0
-        *return: A new pandas DataFrame
+        *method: encode_predictset
+        *description: method to encode prediction data straight into the compiled training column
+        *             layout, the encoded columns missing in the data are 0
+        *return: A pandas DataFrame with the data_columns followed by empid
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
-        *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     use the compiled FeatureLayout
+        *D. Rawlins    18-OCT-2026       1.2     imputer of the ModelSet
+        *D. Rawlins    18-OCT-2026       1.3     FeatureLayout of the ModelSet
         *
         *Parameters
         *   data:
-        *   label_name:
+        *   modelSet: ModelSet the data is predicted with
         """
         try:
-            self.logger.info('Start of building final predictset...')
-            with open('apps/database/columns.json','r') as f:
-                data_columns = json.load(f)['data_columns']
-                f.close()
-            df = pd.DataFrame(data=None, columns=data_columns)
-            df_new = pd.concat([df,data], ignore_index=True, sort=False)
-            data_new = df_new.fillna(0)
-            self.logger.info('Start of building final predictset...')
+            self.logger.info('Start of encoding predictset...')
+            data_new = modelSet.layout.transform(data)
+            #check if missing values are present in the data set
+            is_null_present = self.is_null_present(data_new)
+            #if missing values are there, replace them appropiatelly
+            if(is_null_present):
+                data_new = self.impute_missing_values(data_new, modelSet.imputer) #missing value imputation
+            if 'empid' in data.columns:
+                data_new['empid'] = data['empid'].to_numpy()
+            self.logger.info('End of encoding predictset...')
             return data_new
-                        
-        except ValueError:
-            self.logger.info('ValueError raised while building final predictset')
-            raise ValueError
-        except KeyError:
-            self.logger.info('KeyError raised while building final predictset')
-            raise KeyError
         except Exception as e:
-            self.logger.info('Exception raised while building final predictset: %s' %e)
+            self.logger.exception('Exception raised while encoding predictset: %s' %e)
             raise e
-    
+
     def preprocess_trainset(self):
         """
         *method: preprocess_trainset
@@ -230,6 +338,8 @@ class Preprocessor:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     encoding with the fitted FeatureEncoder
+        *D. Rawlins    18-OCT-2026       1.2     imputer fitted on the features after the label split
         *
         *Parameters
         *   none:
@@ -240,18 +350,18 @@ class Preprocessor:
             data = self.get_data()
             #drop unwanted columns
             data = self.drop_columns(data,['empid'])
-            #handle label encoding
-            cat_df = self.feature_encoding(data)
-            data = pd.concat([data,cat_df],axis=1)
-            #drop categorical column
-            data = self.drop_columns(data, ['salary'])
+            #learn the categories and replace the categorical columns by their dummy columns
+            self.featureEncoder.fit(data)
+            data = self.feature_encoding(data)
+            #create separate features and labels
+            self.X, self.y = self.split_features_label(data, label_name='left')
+            #the imputer is fitted on the features only, it is saved with the models for prediction
+            self.fit_imputer(self.X)
             #check if missing values are present in the data set
-            is_null_present = self.is_null_present(data)
+            is_null_present = self.is_null_present(self.X)
             #if missing values are there, replace them appropiatelly
             if(is_null_present):
-                data = self.impute_missing_values(data) #missing value imputation
-            #create separate features and labels
-            self.X, self.y = self.split_features_label(data, label_name='left')
+                self.X = self.impute_missing_values(self.X) #missing value imputation
             
             self.logger.info('End of Preprocessing...')
             return self.X, self.y
@@ -260,45 +370,26 @@ class Preprocessor:
             self.logger.info('Unsuccessful end of Preprocessing...')
             raise Exception    
         
-    def preprocess_predictset(self):
+    def preprocess_predict_chunks(self, chunk_size, modelSet):
         """
-        *method: preprocess_predictset
-        *description: method to pre-process prediction data
-        *return: data
+        *method: preprocess_predict_chunks
+        *description: method to pre-process prediction data one chunk at a time, every chunk is
+        *             encoded into the training layout and imputed with the fitted imputer
+        *return: generator of pandas DataFrames
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
-        *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     every chunk with the same ModelSet
         *
         *Parameters
-        *   none:
-        """    
-        try:
-            self.logger.info('Start of Preprocessing...')
-            #get data into pandas data frame
-            data = self.get_data()
-            #drop unwanted columns
-            #data = self.drop_columns(data,['empid'])
-            #handle label encoding
-            cat_df = self.feature_encoding(data)
-            data = pd.concat([data,cat_df],axis=1)
-            #drop categorical column
-            data = self.drop_columns(data, ['salary'])
-            #check if missing values are present in the data set
-            is_null_present = self.is_null_present(data)
-            #if missing values are there, replace them appropiatelly
-            if(is_null_present):
-                data = self.impute_missing_values(data) #missing value imputation
-            
-            data = self.final_predictset(data)
-            self.logger.info('End of Preprocessing...')
-            return data
-            
-        except Exception as e:
-            self.logger.info('Unsuccessful end of Preprocessing...')
-            raise Exception    
-     
-    def preprocess_predict(self,data):
+        *   chunk_size:
+        *   modelSet: ModelSet the data is predicted with
+        """
+        for chunk in self.get_data_chunks(chunk_size):
+            yield self.encode_predictset(chunk, modelSet)
+
+    def preprocess_predict(self, data, modelSet):
         """
         *method: preprocess_predict
         *description: method to pre-process prediction data
@@ -307,23 +398,19 @@ class Preprocessor:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     accept a cached column layout
+        *D. Rawlins    18-OCT-2026       1.2     encoding with the fitted FeatureEncoder
+        *D. Rawlins    18-OCT-2026       1.3     column layout from the compiled FeatureLayout
+        *D. Rawlins    18-OCT-2026       1.4     imputer of the ModelSet
         *
         *Parameters
-        *   none:
+        *   data:
+        *   modelSet: ModelSet the data is predicted with
         """    
         try:
             self.logger.info('Start of Preprocessing...')
-            cat_df = self.feature_encoding(data)
-            data = pd.concat([data,cat_df],axis=1)
-            #drop categorical column
-            data = self.drop_columns(data, ['salary'])
-            #check if missing values are present in the data set
-            is_null_present = self.is_null_present(data)
-            #if missing values are there, replace them appropiatelly
-            if(is_null_present):
-                data = self.impute_missing_values(data) #missing value imputation
-            
-            data = self.final_predictset(data)
+            #encode with the training categories into the training column layout, impute missing values
+            data = self.encode_predictset(data, modelSet)
             self.logger.info('End of Preprocessing...')
             return data
             
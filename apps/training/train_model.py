@@ -1,4 +1,7 @@
 import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from sklearn.model_selection import train_test_split
 
 from apps.core.logger import Logger
@@ -22,22 +25,80 @@ class TrainModel:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     search strategy selectable per run
+    *D. Rawlins    18-OCT-2026       1.2     train the clusters concurrently
+    *D. Rawlins    18-OCT-2026       1.3     fast elbow and elbow plot selectable per run
+    *D. Rawlins    18-OCT-2026       1.4     save the fitted imputer with the models
+    *D. Rawlins    18-OCT-2026       1.5     model manifest with cluster and score
+    *D. Rawlins    18-OCT-2026       1.6     elbow sample size selectable per run
+    *D. Rawlins    18-OCT-2026       1.7     the run ends after the elbow plot is saved
+    *D. Rawlins    18-OCT-2026       1.8     models saved in a version directory, published once complete
+    *D. Rawlins    18-OCT-2026       1.9     cluster workers started without fork
+    *D. Rawlins    18-OCT-2026       1.10    columns and encoder saved in the model version directory
     *
     *
     *description: Class to training the models
     *
     **************************************************************************
     """
-    def __init__(self, run_id, data_path):
+    def __init__(self, run_id, data_path, search_strategy='grid', n_jobs=-1, cluster_workers=None, fast_elbow=False, plot_elbow=False, imputer_strategy='knn', elbow_sample_size=None):
         self.run_id = run_id
         self.data_path = data_path
+        self.search_strategy = search_strategy
+        # cores budget shared by the cluster workers and their hyper parameter searches
+        self.n_jobs = os.cpu_count() if n_jobs in (None, -1) else max(1, int(n_jobs))
+        # number of clusters trained at the same time, defaults to one per core up to the number of clusters
+        self.cluster_workers = cluster_workers
         self.logger = Logger(self.run_id, 'TrainModel', 'training')
         self.loadValidate = LoadValidate(self.run_id, self.data_path, 'training')
-        self.preProcess = Preprocessor(self.run_id, self.data_path, 'training')
-        self.modelTuner = ModelTuner(self.run_id, self.data_path, 'training')
-        self.fileOperation = FileOperation(self.run_id, self.data_path, 'training')
-        self.cluster = KMeansCluster(self.run_id, self.data_path)
+        self.preProcess = Preprocessor(self.run_id, self.data_path, 'training', imputer_strategy=imputer_strategy)
+        # the models of the run are saved in apps/models/<run_id>, nothing is served until they are published
+        self.fileOperation = FileOperation(self.run_id, self.data_path, 'training', self.run_id)
+        self.cluster = KMeansCluster(self.run_id, self.data_path, fast_elbow=fast_elbow, sample_size=elbow_sample_size,
+                                     plot_elbow=plot_elbow, model_version=self.run_id)
+        self.published = None
     
+    @staticmethod
+    def train_cluster(run_id, data_path, cluster_number, cluster_data, n_jobs, search_strategy, model_version=None):
+        """
+        *method: train_cluster
+        *description: method to tune, fit and save the best model of one cluster. It runs in a worker
+        *             process, so it builds its own tuner and file operation objects.
+        *return: cluster number, best model name and its score
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     cluster and score saved in the model manifest
+        *D. Rawlins    18-OCT-2026       1.2     saved in the model version directory
+        *
+        *Parameters
+        *   run_id:
+        *   data_path:
+        *   cluster_number:
+        *   cluster_data: features of the cluster with the Labels column
+        *   n_jobs: cores given to the hyper parameter search of this cluster
+        *   search_strategy:
+        *   model_version: version directory of the models
+        """
+        modelTuner = ModelTuner(run_id, data_path, 'training', n_jobs=n_jobs, search_strategy=search_strategy)
+        fileOperation = FileOperation(run_id, data_path, 'training', model_version)
+        
+        #Prepare the feature and Label columns
+        cluster_features = cluster_data.drop(['Labels'], axis=1)
+        cluster_label = cluster_data['Labels']
+        
+        #splitting the data into training and test set for each cluster one by one
+        x_train, x_test, y_train, y_test = train_test_split(cluster_features,cluster_label,test_size=0.2,random_state=0)
+        
+        #getting the best model for each clusters
+        best_model_name, best_model = modelTuner.get_best_model(x_train, y_train, x_test, y_test)
+        score = modelTuner.xgboost_score if best_model_name == 'XGBoost' else modelTuner.random_forest_score
+        
+        #saving the best model to the directory.
+        fileOperation.save_model(best_model,best_model_name+str(cluster_number), cluster=int(cluster_number), score=score)
+        return cluster_number, best_model_name, score
+
     def training_model(self):
         """
         *method: trainingModel
@@ -47,6 +108,14 @@ class TrainModel:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     clusters trained concurrently on a process pool
+        *D. Rawlins    18-OCT-2026       1.2     save the fitted FeatureEncoder
+        *D. Rawlins    18-OCT-2026       1.3     save the fitted imputer
+        *D. Rawlins    18-OCT-2026       1.4     wait for the elbow plot
+        *D. Rawlins    18-OCT-2026       1.5     publish the models and the layout only when every cluster is trained
+        *D. Rawlins    18-OCT-2026       1.6     forkserver/spawn workers
+        *D. Rawlins    18-OCT-2026       1.7     fork server preloads the training modules
+        *D. Rawlins    18-OCT-2026       1.8     columns and encoder published with the models
         *
         *Parameters
         *   none:
@@ -59,34 +128,63 @@ class TrainModel:
             #preprocessing activities
             self.X, self.y = self.preProcess.preprocess_trainset()
             columns = {"data_columns":[col for col in self.X.columns]}
-            with open('apps/database/columns.json', 'w') as f:
-                f.write(json.dumps(columns))
             #create clusters
             number_of_clusters = self.cluster.elbow_plot(self.X)
             # Divide the data into clusters
             self.X = self.cluster.create_clusters(self.X, number_of_clusters)
+            #save the imputer with the models of this version
+            self.fileOperation.save_model(self.preProcess.imputer, 'Imputer')
             # create a new column in the dataset consisting of the corresponding cluster assigments.
             self.X['Labels'] = self.y
-            #getting the unique clusters from our dataset
-            list_of_clusters = self.X['Cluster'].unique()
+            #getting the unique clusters from our dataset, largest first so the longest job starts first
+            list_of_clusters = self.X['Cluster'].value_counts().index
             # parsing all the clusters and look for the best ML algorithm to fit on individual cluster
-            for i in list_of_clusters:
-                cluster_data = self.X[self.X['Cluster']==i] #filter the data for one cluster
-                
-                #Prepare the feature and Label columns
-                cluster_features = cluster_data.drop(['Labels','Cluster'], axis=1)
-                cluster_label = cluster_data['Labels']
-                
-                #splitting the data into training and test set for each cluster one by one
-                x_train, x_test, y_train, y_test = train_test_split(cluster_features,cluster_label,test_size=0.2,random_state=0)
-                
-                #getting the best model for each clusters
-                best_model_name, best_model = self.modelTuner.get_best_model(x_train, y_train, x_test, y_test)
-                
-                #saving the best model to the directory.
-                save_model = self.fileOperation.save_model(best_model,best_model_name+str(i))
+            # the clusters are independent, each one is a tune-fit-save job on the worker pool
+            workers = self.cluster_workers or min(len(list_of_clusters), self.n_jobs)
+            workers = max(1, min(workers, len(list_of_clusters)))
+            search_jobs = max(1, self.n_jobs // workers)
+            self.logger.info('Training %d clusters on %d workers with %d cores each' %(len(list_of_clusters), workers, search_jobs))
+            self.cluster_results = {}
+            self.cluster_failures = {}
+            #training runs in a multithreaded server process (request threads, OpenMP pools, pooled sqlite
+            #connections), a forked child would inherit their locks. The workers start from a clean process.
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            context = multiprocessing.get_context(start_method)
+            if start_method == 'forkserver':
+                #the fork server imports the training modules once instead of the server's __main__
+                context.set_forkserver_preload(['apps.training.train_model'])
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                futures = {}
+                for i in list_of_clusters:
+                    cluster_data = self.X[self.X['Cluster']==i].drop(['Cluster'], axis=1) #filter the data for one cluster
+                    futures[executor.submit(self.train_cluster, self.run_id, self.data_path, i, cluster_data,
+                                            search_jobs, self.search_strategy, self.run_id)] = i
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        cluster_number, best_model_name, score = future.result()
+                        self.cluster_results[i] = (best_model_name, score)
+                        self.logger.info('Cluster %s trained: %s with score %s' %(i, best_model_name, score))
+                    except Exception as e:
+                        self.cluster_failures[i] = e
+                        self.logger.info('Cluster %s failed: %s' %(i, e))
+            if self.cluster_failures:
+                raise Exception('Training failed for clusters: '+str(sorted(self.cluster_failures)))
+            #the elbow plot is written in the version directory, it is complete before the publish
+            self.cluster.wait_elbow_plot()
+            #the layout of the predict set belongs to this version, it is served with its models
+            self.preProcess.featureEncoder.save(os.path.join(self.fileOperation.models_dir, 'encoder.json'))
+            with open(os.path.join(self.fileOperation.models_dir, 'columns.json'), 'w') as f:
+                f.write(json.dumps(columns))
+            #every cluster is trained, the whole set of models is served from now on
+            self.published = self.fileOperation.publish_models('KMeans', 'Imputer',
+                {int(i): name+str(i) for i, (name, score) in self.cluster_results.items()},
+                'columns.json', 'encoder.json')
             
             self.logger.info('End of Training')
         except Exception:
             self.logger.exception('Unsuccessful End of Training')
+            #the models of a failed run are never served
+            self.cluster.wait_elbow_plot()
+            self.fileOperation.discard_models()
             raise Exception
\ No newline at end of file
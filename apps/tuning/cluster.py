@@ -1,6 +1,9 @@
-from sklearn.cluster import KMeans
-import matplotlib.pyplot as plt
-from kneed import KneeLocator
+import os
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from threadpoolctl import threadpool_limits
+from sklearn.cluster import KMeans, MiniBatchKMeans
 
 from apps.core.logger import Logger
 from apps.core.file_operation import FileOperation
@@ -22,6 +25,12 @@ class KMeansCluster:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     fast elbow search, fitted model reused for the chosen k
+    *D. Rawlins    18-OCT-2026       1.2     elbow plot is optional, headless and off the critical path
+    *D. Rawlins    18-OCT-2026       1.3     no process environment change for the plot backend
+    *D. Rawlins    18-OCT-2026       1.4     wait for the background elbow plot
+    *D. Rawlins    18-OCT-2026       1.5     KMeans and elbow plot saved in the model version directory
+    *D. Rawlins    18-OCT-2026       1.6     knee found with numpy, kneed and its pyplot import dropped
     *
     *
     *description: Class to cluster the dataset
@@ -29,21 +38,62 @@ class KMeansCluster:
     **************************************************************************
     """
     
-    def __init__(self, run_id, data_path):
+    def __init__(self, run_id, data_path, fast_elbow=False, sample_size=None, n_jobs=None, plot_elbow=False, plot_async=True, model_version=None):
         self.run_id = run_id
         self.data_path = data_path
+        # fast elbow fits MiniBatchKMeans instead of KMeans for every k
+        self.fast_elbow = fast_elbow
+        # number of rows the elbow is computed on, None uses the whole dataset
+        self.sample_size = sample_size
+        # number of k values fitted at the same time, None uses one per core up to 10
+        self.n_jobs = n_jobs or min(10, os.cpu_count())
+        # fitted models of the elbow search by number of clusters and the data they were fitted on
+        self.kmeans_models = {}
+        self.elbow_data = None
+        self.elbow_sampled = False
+        # save kmeans_elbow.png, rendered in a background thread when plot_async
+        self.plot_elbow = plot_elbow
+        self.plot_async = plot_async
+        self.plot_thread = None
+        self.wcss = None
         self.logger = Logger(self.run_id, 'KMeansCluster','training')
-        self.fileOperation = FileOperation(self.run_id, self.data_path, 'training')
+        # KMeans is saved with the cluster models of the same version
+        self.fileOperation = FileOperation(self.run_id, self.data_path, 'training', model_version)
     
+    def fit_kmeans(self, data, number_of_clusters):
+        """
+        *method: fit_kmeans
+        *description: method to fit one KMeans model, MiniBatchKMeans when fast elbow is selected
+        *return: The fitted model
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   data:
+        *   number_of_clusters:
+        """
+        if self.fast_elbow:
+            kmeans = MiniBatchKMeans(n_clusters=number_of_clusters, init='k-means++', random_state=0, batch_size=4096, n_init=3)
+        else:
+            kmeans = KMeans(n_clusters=number_of_clusters, init='k-means++', random_state=0) #initialization the KMeans object
+        kmeans.fit(data) # fitting the data to the KMeans Algorithm
+        return kmeans
+
     def elbow_plot(self, data):
         """
         *method: elbow_plot
-        *description: method to saves the plot to decide the optimum number of clusters to the file.
-        *return: A picture saved to the directory
+        *description: method to find the optimum number of clusters with the elbow method.
+        *return: The optimum number of clusters
         *
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     k values fitted in parallel, optional MiniBatchKMeans and sampling
+        *D. Rawlins    18-OCT-2026       1.2     plotting moved to save_elbow_plot
+        *D. Rawlins    18-OCT-2026       1.3     MPLBACKEND left unchanged
+        *D. Rawlins    18-OCT-2026       1.4     knee found by find_knee
         *
         *Parameters
         *   data:
@@ -52,24 +102,121 @@ class KMeansCluster:
         
         try:
             self.logger.info('Start of elbow plotting...')
-            for i in range(1,11):
-                kmeans = KMeans(n_clusters=i, init='k-means++', random_state=0) #initialization the KMeans object
-                kmeans.fit(data) # fitting the data to the KMeans Algorithm
-                wcss.append(kmeans.inertia_)
-            plt.plot(range(1,11), wcss)
-            plt.title('The Elbow Method')
-            plt.xlabel('Number of clusters')
-            plt.ylabel('WCSS')
-            plt.savefig('apps/models/kmeans_elbow.png') #Saving the elbow plot locally
+            sample = data
+            self.elbow_sampled = self.sample_size is not None and self.sample_size < len(data)
+            if self.elbow_sampled:
+                sample = data.sample(n=self.sample_size, random_state=0)
+                self.logger.info('Elbow computed on a sample of %d rows' %self.sample_size)
+            #the k values are independent, they are fitted at the same time and the
+            #OpenMP threads of each fit are limited so the cores are not oversubscribed
+            with threadpool_limits(limits=max(1, os.cpu_count() // self.n_jobs)):
+                with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+                    self.kmeans_models = dict(zip(range(1,11), executor.map(lambda i: self.fit_kmeans(sample, i), range(1,11))))
+            self.elbow_data = data
+            wcss = [self.kmeans_models[i].inertia_ for i in range(1,11)]
+            #the plot is saved by create_clusters once the models directory is rebuilt
+            self.wcss = wcss
             # finding the value of the optimum cluster programmatically
-            self.kn = KneeLocator(range(1,11), wcss, curve='convex', direction='decreasing')
-            self.logger.info('The optimum number of clusters is: '+str(self.kn.knee))
+            self.knee = self.find_knee(range(1,11), wcss)
+            self.logger.info('The optimum number of clusters is: '+str(self.knee))
             self.logger.info('End of elbow plotting...')
-            return self.kn.knee
+            return self.knee
             
         except Exception as e:
             self.logger.exception('Exception raised while elbow plotting:'+str(e))
             raise Exception()
+
+    def find_knee(self, x, y, sensitivity=1.0):
+        """
+        *method: find_knee
+        *description: method to find the knee of a convex decreasing curve with the Kneedle algorithm,
+        *             the knee KneeLocator(x, y, curve='convex', direction='decreasing') of kneed finds.
+        *             kneed imports pyplot, which every training run paid for.
+        *return: x value of the knee, None when the curve has none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   x: increasing x values
+        *   y: decreasing y values
+        *   sensitivity: S of Kneedle, how many flat steps are allowed after the knee
+        """
+        x_values = np.asarray(x, dtype=float)
+        y_values = np.asarray(y, dtype=float)
+        x_normalized = (x_values - x_values.min()) / (x_values.max() - x_values.min())
+        y_normalized = (y_values - y_values.min()) / (y_values.max() - y_values.min())
+        #flipped into a concave increasing curve, the knee is where it is the farthest above the diagonal
+        difference = (y_normalized.max() - y_normalized) - x_normalized
+        previous = np.concatenate((difference[:1], difference[:-1]))
+        following = np.concatenate((difference[1:], difference[-1:]))
+        maxima = np.flatnonzero((difference >= previous) & (difference >= following))
+        minima = np.flatnonzero((difference <= previous) & (difference <= following))
+        if not maxima.size:
+            return None
+        thresholds = difference[maxima] - sensitivity * np.abs(np.diff(x_normalized).mean())
+        threshold, threshold_index, maxima_seen, detecting = 0.0, 0, 0, True
+        #a local maximum is the knee once the curve drops below its threshold before the next local
+        #minimum, past a minimum nothing is detected until the next maximum
+        for i in range(maxima[0], len(difference) - 1):
+            if i in maxima:
+                threshold, threshold_index, detecting = thresholds[maxima_seen], i, True
+                maxima_seen += 1
+            if i in minima:
+                threshold, detecting = 0.0, False
+            if detecting and difference[i + 1] < threshold:
+                return x[threshold_index]
+        return None
+    def save_elbow_plot(self):
+        """
+        *method: save_elbow_plot
+        *description: method to save the elbow plot to kmeans_elbow.png of the models. matplotlib is
+        *             imported here and a standalone Agg figure is used, so nothing is kept in pyplot's
+        *             global state between training runs.
+        *return: A picture saved to the directory
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     saved in the model version directory
+        *
+        *Parameters
+        *   none:
+        """
+        try:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            fig = Figure()
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+            ax.plot(range(1,11), self.wcss)
+            ax.set_title('The Elbow Method')
+            ax.set_xlabel('Number of clusters')
+            ax.set_ylabel('WCSS')
+            fig.savefig(os.path.join(self.fileOperation.models_dir, 'kmeans_elbow.png')) #Saving the elbow plot locally
+            fig.clear()
+            self.logger.info('Elbow plot saved')
+        except Exception as e:
+            self.logger.exception('Exception raised while saving elbow plot:'+str(e))
+
+    def wait_elbow_plot(self):
+        """
+        *method: wait_elbow_plot
+        *description: method to wait until the elbow plot rendered in the background is saved
+        *return: none
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *
+        *Parameters
+        *   none:
+        """
+        if self.plot_thread is not None:
+            self.plot_thread.join()
+            self.plot_thread = None
+
     def create_clusters(self, data, number_of_clusters):
         """
         *method: create_clusters
@@ -79,6 +226,9 @@ class KMeansCluster:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     reuse the model fitted by the elbow search
+        *D. Rawlins    18-OCT-2026       1.2     save the optional elbow plot after the KMeans model
+        *D. Rawlins    18-OCT-2026       1.3     logs the number of clusters created
         *
         *Parameters
         *   data:
@@ -87,13 +237,27 @@ class KMeansCluster:
         self.data = data
         try:
             self.logger.info('Start of Create clusters...')
-            self.kmeans = KMeans(n_clusters=number_of_clusters, init='k-means++', random_state=0)
-            self.y_kmeans = self.kmeans.fit_predict(data) # divide data into clusters
+            if number_of_clusters in self.kmeans_models:
+                #reuse the model fitted by the elbow search for the chosen k
+                self.kmeans = self.kmeans_models[number_of_clusters]
+                if data is self.elbow_data and not self.elbow_sampled:
+                    self.y_kmeans = self.kmeans.labels_
+                else:
+                    self.y_kmeans = self.kmeans.predict(data)
+            else:
+                self.kmeans = KMeans(n_clusters=number_of_clusters, init='k-means++', random_state=0)
+                self.y_kmeans = self.kmeans.fit_predict(data) # divide data into clusters
             self.saveModel = self.fileOperation.save_model(self.kmeans, 'KMeans')
+            if self.plot_elbow and self.wcss is not None:
+                if self.plot_async:
+                    self.plot_thread = threading.Thread(target=self.save_elbow_plot, daemon=True)
+                    self.plot_thread.start()
+                else:
+                    self.save_elbow_plot()
             # saving the KMeans model to directory
             # passing 'Model' as the funtions need three parameters
             self.data['Cluster'] = self.y_kmeans # create a new column in dataset for storing cluster information
-            self.logger.info('succesfully created '+str(self.kn.knee)+' clusters.')    
+            self.logger.info('succesfully created '+str(number_of_clusters)+' clusters.')    
         
             self.logger.info('End of Create clusters...')
             return self.data
@@ -1,9 +1,12 @@
-from sklearn.model_selection import GridSearchCV
+import os
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.experimental import enable_halving_search_cv # noqa: F401, enables HalvingGridSearchCV
+from sklearn.model_selection import HalvingGridSearchCV
 from sklearn.ensemble import RandomForestClassifier
 from xgboost import XGBClassifier
 from sklearn.metrics import roc_auc_score, accuracy_score
 from apps.core.logger import Logger
-from sklearn.metrics import r2_score
 
 class ModelTuner:
     """_summary_
@@ -19,19 +22,67 @@ class ModelTuner:
     *who           when           version    change(include bug# if apply)
     *----------    -----------    -------    -----------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     parallel grid search over a shared cores budget
+    *D. Rawlins    18-OCT-2026       1.2     successive halving search strategy
+    *D. Rawlins    18-OCT-2026       1.3     cores split between the parallel searches, served models single threaded
+    *D. Rawlins    18-OCT-2026       1.4     parallel searches back on the whole cores budget, they share one executor
     *
     *
     *description: Class to tune and select best model
     *
     **************************************************************************
     """
-    def __init__(self, run_id, data_path, mode):
+    def __init__(self, run_id, data_path, mode, n_jobs=-1, parallel_models=True, search_strategy='grid'):
         self.run_id = run_id
         self.data_path = data_path
         self.logger = Logger(self.run_id, 'ModelTuner', mode)
-        self.rfc = RandomForestClassifier()
-        self.xgb = XGBClassifier(objective='binary:logistic')
+        # cores budget for the candidate fits, -1 or None means all cores
+        self.n_jobs = os.cpu_count() if n_jobs in (None, -1) else max(1, int(n_jobs))
+        # search XGBoost and Random Forest at the same time
+        self.parallel_models = parallel_models
+        # cores of one search and its final fit, the parallel searches share the one loky executor of
+        # n_jobs workers, splitting the budget between them would leave half of it idle
+        self.search_jobs = self.n_jobs
+        # 'grid' fits every candidate fully, 'halving' uses successive halving over n_estimators
+        if search_strategy not in ('grid', 'halving'):
+            raise ValueError('Unknown search strategy: '+str(search_strategy))
+        self.search_strategy = search_strategy
+        # XGBoost rounds without improvement on the validation fold before stopping
+        self.early_stopping_rounds = 10
+        self.rfc = RandomForestClassifier(n_jobs=1)
+        # one thread per candidate fit, the grid search runs the candidates in parallel
+        self.xgb = XGBClassifier(objective='binary:logistic', n_jobs=1)
         
+    def search_best_params(self, estimator, param_grid, train_x, train_y):
+        """
+        *method: search_best_params
+        *description: method to run the hyper parameter search with the selected strategy.
+        *             'halving' drops n_estimators from the grid and uses it as the budget, so the
+        *             candidates are first fitted with few trees and only the best ones get more.
+        *return: The fitted search object
+        *
+        *who           when           version   change (include bug# if apply)
+        *---------     -----------    -------   ------------------------------
+        *D. Rawlins    18-OCT-2026       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     search_jobs cores
+        *
+        *Parameters
+        *   estimator:
+        *   param_grid:
+        *   train_x:
+        *   train_y:
+        """
+        if self.search_strategy == 'halving':
+            param_grid = dict(param_grid)
+            n_estimators = param_grid.pop('n_estimators')
+            grid = HalvingGridSearchCV(estimator=estimator, param_grid=param_grid, resource='n_estimators',
+                                       min_resources=min(n_estimators), max_resources=max(n_estimators),
+                                       factor=3, cv=5, n_jobs=self.search_jobs)
+        else:
+            grid = GridSearchCV(estimator=estimator, param_grid=param_grid, cv=5, n_jobs=self.search_jobs)
+        grid.fit(train_x, train_y)
+        return grid
+
     def best_params_randomforest(self, train_x, train_y):
         """
         *method: best_params_randomforest
@@ -42,6 +93,9 @@ class ModelTuner:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     candidate fits on n_jobs processes
+        *D. Rawlins    18-OCT-2026       1.2     search with the selected strategy
+        *D. Rawlins    18-OCT-2026       1.3     search and final fit on search_jobs cores
         *
         *Parameters
         *   train_x:
@@ -53,24 +107,20 @@ class ModelTuner:
             self.param_grid = {"n_estimators":[10,50,100,130], "criterion":['gini','entropy'],
                                "max_depth":range(2,4,1),"max_features":['auto','log2']}
             
-            #creating an object of the Grid Search class
-            self.grid = GridSearchCV(estimator=self.rfc, param_grid=self.param_grid, cv=5)
+            #creating an object of the Grid Search class, the candidate fits run on the process pool
+            #locals are used because the XGBoost search may run at the same time on this object
             #finding the best parameters
-            self.grid.fit(train_x, train_y)
-            
-            #extracting the best parameters
-            self.criterion = self.grid.best_params_['criterion']
-            self.max_depth = self.grid.best_params_['max_depth']
-            self.max_features = self.grid.best_params_['max_features']
-            self.n_estimators = self.grid.best_params_['n_estimators']
+            grid = self.search_best_params(RandomForestClassifier(n_jobs=1), self.param_grid, train_x, train_y)
             
             #crating a new model with the best parameters
-            self.rfc = RandomForestClassifier(n_estimators=self.n_estimators, criterion=self.criterion,
-                                              max_depth=self.max_depth, max_features=self.max_features)
+            rfc = RandomForestClassifier(n_estimators=grid.best_params_['n_estimators'], criterion=grid.best_params_['criterion'],
+                                         max_depth=grid.best_params_['max_depth'], max_features=grid.best_params_['max_features'],
+                                         n_jobs=self.search_jobs)
             
             #training the new model
-            self.rfc.fit(train_x,train_y)
-            self.logger.info('Random Forest best params: '+str(self.grid.best_params_))
+            rfc.fit(train_x,train_y)
+            self.rfc = rfc
+            self.logger.info('Random Forest best params: '+str(grid.best_params_))
             
             self.logger.info('End of finding best params for randomforest algo...')
             return self.rfc
@@ -88,6 +138,9 @@ class ModelTuner:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     candidate fits on n_jobs processes
+        *D. Rawlins    18-OCT-2026       1.2     search with the selected strategy
+        *D. Rawlins    18-OCT-2026       1.3     search and final fit on search_jobs cores
         *
         *Parameters
         *   train_x:
@@ -102,20 +155,28 @@ class ModelTuner:
                 'n_estimators':[10,50,100,200]
             }
             
-            #creating an object of the Grid Search class
-            self.grid = GridSearchCV(estimator=self.xgb, param_grid=self.param_grid_xgboost, cv=5)
+            #creating an object of the Grid Search class, the candidate fits run on the process pool
+            #with a single XGBoost thread each so the machine is not oversubscribed
             #finding the best parameters
-            self.grid.fit(train_x, train_y)
+            grid = self.search_best_params(XGBClassifier(objective='binary:logistic', n_jobs=1), self.param_grid_xgboost, train_x, train_y)
             
-            #extracting the best parameters
-            self.learning_rate = self.grid.best_params_['learning_rate']
-            self.max_depth = self.grid.best_params_['max_depth']
-            self.n_estimators = self.grid.best_params_['n_estimators']
-            #creating a new model with the best parameters
-            self.xgb = XGBClassifier(objective='binary:logistic', learning_rate=self.learning_rate, max_depth=self.max_depth, n_estimators=self.n_estimators)
-            #training the new model
-            self.xgb.fit(train_x,train_y)
-            self.logger.info('XGBoost best params: '+str(self.grid.best_params_))
+            if self.search_strategy == 'halving':
+                #the number of rounds is chosen by early stopping on a validation fold, up to the largest budget
+                xgb = XGBClassifier(objective='binary:logistic', learning_rate=grid.best_params_['learning_rate'],
+                                    max_depth=grid.best_params_['max_depth'], n_estimators=max(self.param_grid_xgboost['n_estimators']),
+                                    early_stopping_rounds=self.early_stopping_rounds, n_jobs=self.search_jobs)
+                fit_x, valid_x, fit_y, valid_y = train_test_split(train_x, train_y, test_size=0.2, random_state=0)
+                xgb.fit(fit_x, fit_y, eval_set=[(valid_x, valid_y)], verbose=False)
+                self.logger.info('XGBoost early stopping best iteration: '+str(xgb.best_iteration))
+            else:
+                #creating a new model with the best parameters
+                xgb = XGBClassifier(objective='binary:logistic', learning_rate=grid.best_params_['learning_rate'],
+                                    max_depth=grid.best_params_['max_depth'], n_estimators=grid.best_params_['n_estimators'],
+                                    n_jobs=self.search_jobs)
+                #training the new model
+                xgb.fit(train_x,train_y)
+            self.xgb = xgb
+            self.logger.info('XGBoost best params: '+str(grid.best_params_))
             
             
             self.logger.info('End of finding best params for XGBoost algo...')   
@@ -134,6 +195,8 @@ class ModelTuner:
         *who           when           version   change (include bug# if apply)
         *---------     -----------    -------   ------------------------------
         *D. Rawlins    12-JAN-2024       1.0     initial creation
+        *D. Rawlins    18-OCT-2026       1.1     search both models at the same time
+        *D. Rawlins    18-OCT-2026       1.2     models returned with a single thread for serving
         *
         *Parameters
         *   train_x:
@@ -143,8 +206,17 @@ class ModelTuner:
         """
         try:
             self.logger.info('Start of finding best model...')
-            #create best model for XGBoost
-            self.xgboost = self.best_params_xgboost(train_x, train_y)
+            if self.parallel_models:
+                #the searches run at the same time, their candidate fits queue on the same n_jobs workers
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    future_xgboost = executor.submit(self.best_params_xgboost, train_x, train_y)
+                    future_random_forest = executor.submit(self.best_params_randomforest, train_x, train_y)
+                    self.xgboost = future_xgboost.result()
+                    self.random_forest = future_random_forest.result()
+            else:
+                self.xgboost = self.best_params_xgboost(train_x, train_y)
+                self.random_forest = self.best_params_randomforest(train_x, train_y)
+            #score best model for XGBoost
             self.prediction_xgboost = self.xgboost.predict(test_x) #Prediction using the XGBoost Model
             
             if len(test_y.unique())== 1: # if there's only one label in y, then roc_auc_score returns error. we will use accuracy in that case
@@ -154,8 +226,7 @@ class ModelTuner:
                 self.xgboost_score = roc_auc_score(test_y, self.prediction_xgboost) #AUC for XGBoost
                 self.logger.info('AUC for XGBoost:'+str(self.xgboost_score))
             
-            #create best model for Random forest
-            self.random_forest = self.best_params_randomforest(train_x, train_y)
+            #score best model for Random forest
             self.prediction_random_forest = self.random_forest.predict(test_x) #Prediction using the Random Forest Algo
             
             if len(test_y.unique())== 1: # if there's only one label in y, then roc_auc_score returns error. we will use accuracy in that case
@@ -165,6 +236,9 @@ class ModelTuner:
                 self.random_forest_score = roc_auc_score(test_y, self.prediction_random_forest) #AUC for Random Forest
                 self.logger.info('AUC for Random Forest:'+str(self.random_forest_score))
             
+            #the models are saved with their n_jobs, a served prediction must not start a thread pool
+            self.xgboost.set_params(n_jobs=1)
+            self.random_forest.set_params(n_jobs=1)
             #Comparing the models
             self.logger.info('End of finding best model...')
             if (self.random_forest_score < self.xgboost_score):
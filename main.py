@@ -1,19 +1,50 @@
-from wsgiref import simple_server
 from flask import Flask, render_template, request
-from flask import Response
+from flask import Response, jsonify, send_file
 from flask_cors import CORS, cross_origin
+from werkzeug.exceptions import BadRequest
 import flask_monitoringdashboard as dashboard
 import pandas as pd
 import os 
 
 from apps.core.config import Config
+from apps.core.job_queue import JobQueue
+from apps.core.server import Server
 from apps.training.train_model import TrainModel
 from apps.prediction.predict_model import PredictModel
+from apps.prediction.prediction_service import PredictionService
 
 app = Flask(__name__)
 
 CORS(app)
 
+#long-lived objects shared by every request, built by create_app. The training workers import this
+#module again as __mp_main__, building them at import would load the models and bind the dashboard
+#in every worker.
+config = None
+predictionService = None
+jobQueue = None
+
+def create_app():
+    """
+    *method: create_app
+    *description: method to build the objects shared by the requests and bind the dashboard
+    *return: app
+    *
+    *who           when           version   change (include bug# if apply)
+    *---------     -----------    -------   ------------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *Parameters
+    *   none:
+    """
+    global config, predictionService, jobQueue
+    config = Config()
+    predictionService = PredictionService()
+    #training and batch prediction run in the background, their state is kept in apps/database/jobs.db
+    jobQueue = JobQueue(predictionService.run_id, config.job_limits)
+    dashboard.bind(app)
+    return app
+
 @app.route('/', methods=['POST','GET'])
 def index_page():
     """
@@ -30,38 +61,93 @@ def index_page():
     """
     return render_template('index.html')
 
+def run_training(run_id, search_strategy):
+    """
+    *method: run_training
+    *description: method to run the training job
+    *return: published models
+    *
+    *who           when           version   change (include bug# if apply)
+    *---------     -----------    -------   ------------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     elbow_sample_size from Config
+    *D. Rawlins    18-OCT-2026       1.2     result is the published model version
+    *
+    *Parameters
+    *   run_id:
+    *   search_strategy: 'grid' or 'halving'
+    """
+    #train model object initialization
+    trainModel = TrainModel(run_id, config.training_data_path, search_strategy, fast_elbow=config.fast_elbow,
+                            plot_elbow=config.plot_elbow, imputer_strategy=config.imputer_strategy,
+                            elbow_sample_size=config.elbow_sample_size)
+    #training the model
+    trainModel.training_model()
+    return trainModel.published
+
+def run_batch_prediction(run_id):
+    """
+    *method: run_batch_prediction
+    *description: method to run the batch prediction job
+    *return: result file name
+    *
+    *who           when           version   change (include bug# if apply)
+    *---------     -----------    -------   ------------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *Parameters
+    *   run_id:
+    """
+    #prediction object initialization
+    predictModel = PredictModel(run_id, config.prediction_data_path, config.batch_chunk_size, config.result_format)
+    #prediction the model
+    return {'file': predictModel.batch_predict_from_model()}
+
+def job_submitted(run_id):
+    """
+    *method: job_submitted
+    *description: method to build the response of a queued job
+    *return: 202 response with the run id and the job urls
+    *
+    *who           when           version   change (include bug# if apply)
+    *---------     -----------    -------   ------------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *Parameters
+    *   run_id:
+    """
+    return jsonify({'run_id': run_id, 'status': 'queued',
+                    'status_url': '/jobs/'+run_id, 'result_url': '/jobs/'+run_id+'/result'}), 202
+
 @app.route('/training', methods = ['POST'])
 @cross_origin()
 def training_route_client():
     """
     *method: training_route_client
     *description: method to call training route
-    *return: none
+    *return: run id of the queued training job
     *
     *who           when           version   change (include bug# if apply)
     *---------     -----------    -------   ------------------------------
     *D. Rawlins    12-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     optional search_strategy form field
+    *D. Rawlins    18-OCT-2026       1.2     run as a background job
+    *D. Rawlins    18-OCT-2026       1.3     search_strategy validated before the job is queued
     *
     *Parameters
     *   none:
     """
     try:
-        config = Config()
-        #get run id and data path
+        #get run id
         run_id = config.get_run_id()
-        data_path = config.training_data_path
-        #train model object initialization
-        trainModel = TrainModel(run_id, data_path)
-        #training the model
-        trainModel.training_model()
-                
-        return Response("Training successfull! and its RunID is: "+str(run_id))
-    except ValueError:
-        return Response("Error Occurred! %s" % ValueError)
-    except KeyError:
-        return Response("Error Occurred! %s" % KeyError)
+        #'grid' or 'halving' hyper parameter search, the form field overrides the default
+        search_strategy = request.form.get('search_strategy', config.search_strategy)
+        if search_strategy not in ('grid', 'halving'):
+            return jsonify({'error': 'search_strategy must be grid or halving'}), 400
+        jobQueue.submit('training', run_id, lambda run_id: run_training(run_id, search_strategy))
+        return job_submitted(run_id)
     except Exception as e:
-        return Response("Error Occurred! %s" % e)
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/batchprediction', methods = ['POST'])
 @cross_origin()
@@ -69,32 +155,74 @@ def batch_prediction_route_client():
     """
     *method: batch_prediction_route_client
     *description: method to call batch prediction route
-    *return: none
+    *return: run id of the queued batch prediction job
     *
     *who           when           version   change (include bug# if apply)
     *---------     -----------    -------   ------------------------------
     *D. Rawlins    19-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     chunked batch prediction
+    *D. Rawlins    18-OCT-2026       1.2     result format from Config
+    *D. Rawlins    18-OCT-2026       1.3     run as a background job
     *
     *Parameters
     *   none:
     """
     try:
-        config = Config()
-        #get run id and data path
+        #get run id
         run_id = config.get_run_id()
-        data_path = config.prediction_data_path
-        #prediction object initialization
-        predictModel = PredictModel(run_id, data_path)
-        #prediction the model
-        predictModel.batch_predict_from_model()
-                
-        return Response("Prediction successfull! and its RunID is: "+str(run_id))
-    except ValueError:
-        return Response("Error Occurred! %s" % ValueError)
-    except KeyError:
-        return Response("Error Occurred! %s" % KeyError)
+        jobQueue.submit('batchprediction', run_id, run_batch_prediction)
+        return job_submitted(run_id)
     except Exception as e:
-        return Response("Error Occurred! %s" % e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs/<run_id>', methods = ['GET'])
+@cross_origin()
+def job_status_route_client(run_id):
+    """
+    *method: job_status_route_client
+    *description: method to get the state of a training or batch prediction job
+    *return: job status, 404 for an unknown run id
+    *
+    *who           when           version   change (include bug# if apply)
+    *---------     -----------    -------   ------------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *Parameters
+    *   run_id:
+    """
+    job = jobQueue.status(run_id)
+    if job is None:
+        return jsonify({'error': 'unknown run_id '+run_id}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<run_id>/result', methods = ['GET'])
+@cross_origin()
+def job_result_route_client(run_id):
+    """
+    *method: job_result_route_client
+    *description: method to get the result of a job: the trained models, or the prediction file of
+    *             the last finished batch prediction. A newer batch prediction replaces the file.
+    *return: result, 409 while the job is not finished, 410 for a replaced prediction file
+    *
+    *who           when           version   change (include bug# if apply)
+    *---------     -----------    -------   ------------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *Parameters
+    *   run_id:
+    """
+    job = jobQueue.status(run_id)
+    if job is None:
+        return jsonify({'error': 'unknown run_id '+run_id}), 404
+    if job['status'] == 'failed':
+        return jsonify({'status': job['status'], 'error': job['error']}), 500
+    if job['status'] != 'finished':
+        return jsonify({'status': job['status']}), 409
+    if job['kind'] == 'batchprediction':
+        if jobQueue.latest_finished('batchprediction') != run_id or not os.path.isfile(job['result']['file']):
+            return jsonify({'error': 'result replaced by a newer batch prediction'}), 410
+        return send_file(os.path.abspath(job['result']['file']), as_attachment=True)
+    return jsonify(job['result'])
 
 @app.route('/prediction', methods = ['POST'])
 @cross_origin()
@@ -107,15 +235,13 @@ def single_prediction_route_client():
     *who           when           version   change (include bug# if apply)
     *---------     -----------    -------   ------------------------------
     *D. Rawlins    19-JAN-2024       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     predict with the shared PredictionService
     *
     *Parameters
     *   none:
     """
     try:
-        config = Config()
-        #get run id and data path
-        run_id = config.get_run_id()
-        data_path = config.prediction_data_path
+        run_id = predictionService.run_id
         
         if request.method == 'POST':
             satisfaction_level = request.form['satisfaction_level']
@@ -163,10 +289,8 @@ def single_prediction_route_client():
             }
             data = data.astype(convert_dict)
             
-            # object initialization
-            predictModel = PredictModel(run_id,data_path)
             # prediction model
-            output = predictModel.single_predict_from_model(data)
+            output = predictionService.single_predict(data)
             return Response("Predicted Output is: "+str(output))
                 
         return Response("Prediction successfull! and its RunID is: "+str(run_id))
@@ -177,11 +301,93 @@ def single_prediction_route_client():
     except Exception as e:
         return Response("Error Occurred! %s" % e)
 
-dashboard.bind(app)
+@app.route('/prediction/batch', methods = ['POST'])
+@cross_origin()
+def batch_scoring_route_client():
+    """
+    *method: batch_scoring_route_client
+    *description: method to score many records in one call. The body is a JSON array of records,
+    *             {"records": [...]}, a columnar JSON object of lists or an Arrow IPC stream
+    *             (Content-Type application/vnd.apache.arrow.stream). The response is JSON, or Arrow
+    *             IPC when the Accept header asks for it.
+    *return: predictions
+    *
+    *who           when           version   change (include bug# if apply)
+    *---------     -----------    -------   ------------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *D. Rawlins    18-OCT-2026       1.1     400 only for an invalid payload, scoring errors are 500
+    *
+    *Parameters
+    *   none:
+    """
+    arrow_type = 'application/vnd.apache.arrow.stream'
+    try:
+        if request.mimetype == arrow_type:
+            import pyarrow as pa
+            data = pa.ipc.open_stream(request.get_data()).read_pandas()
+        else:
+            payload = request.get_json(force=True)
+            if isinstance(payload, dict) and 'records' in payload:
+                payload = payload['records']
+            data = pd.DataFrame.from_records(payload) if isinstance(payload, list) else pd.DataFrame(payload)
+        data = predictionService.validate_records(data)
+    except (ValueError, KeyError, TypeError, BadRequest) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    #the payload is valid from here, a failure while scoring is a server error
+    try:
+        y_predicted = predictionService.predict_rows(data)
+        if arrow_type in request.headers.get('Accept', ''):
+            import pyarrow as pa
+            table = pa.table({'empid': data['empid'].to_numpy(), 'prediction': y_predicted})
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return Response(sink.getvalue().to_pybytes(), mimetype=arrow_type)
+        return jsonify({'empid': data['empid'].tolist(), 'prediction': y_predicted.tolist()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/health', methods = ['GET'])
+def health_route_client():
+    """
+    *method: health_route_client
+    *description: method to tell the process is alive
+    *return: status
+    *
+    *who           when           version   change (include bug# if apply)
+    *---------     -----------    -------   ------------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *Parameters
+    *   none:
+    """
+    return jsonify({'status': 'ok'})
+
+@app.route('/ready', methods = ['GET'])
+def ready_route_client():
+    """
+    *method: ready_route_client
+    *description: method to tell the models are loaded and predictions can be served
+    *return: status, 503 when not ready
+    *
+    *who           when           version   change (include bug# if apply)
+    *---------     -----------    -------   ------------------------------
+    *D. Rawlins    18-OCT-2026       1.0     initial creation
+    *
+    *Parameters
+    *   none:
+    """
+    if predictionService.ready():
+        return jsonify({'status': 'ready'})
+    return jsonify({'status': 'not ready'}), 503
 
 if __name__ == "__main__":
     #app.run()
-    host = '0.0.0.0'
-    port = 5000
-    httpd = simple_server.make_server(host, port, app)
-    httpd.serve_forever()
+    create_app()
+    #models loaded before the workers fork, their pages are shared
+    predictionService.preload()
+    server = Server(app, predictionService.run_id, config.server_host, config.server_port,
+                    config.server_workers, config.server_threads, config.server_timeout)
+    server.run()